@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def lock_path(path):
+    """Lock file for a target; the data file itself is replaced on every write so it cannot carry the lock"""
+    # Kept in a local directory so no lock files land in synced repositories such as Data-tracker
+    lock_dir = os.getenv('ATOMIC_IO_LOCK_DIR', './data/locks')
+    target = os.path.realpath(path)
+    digest = hashlib.sha256(target.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(os.path.abspath(lock_dir), f"{os.path.basename(target)}.{digest}.lock")
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Advisory lock coordinating writers (and optionally readers) of one file across processes"""
+    if fcntl is None:
+        yield
+        return
+
+    lock_file_path = lock_path(path)
+    os.makedirs(os.path.dirname(lock_file_path), exist_ok=True)
+    with open(lock_file_path, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _target_mode(path):
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+@contextmanager
+def _no_lock():
+    yield
+
+
+def fsync_directory(directory):
+    """Persist a rename by syncing the directory entry"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path, mode='w', lock=True, encoding=None):
+    """Write to a temp file beside the target, fsync, then rename it over the target"""
+    # Pass lock=False when the caller already holds file_lock(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    with (file_lock(path) if lock else _no_lock()):
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+        try:
+            # mkstemp creates 0600 files; keep the permissions readers of the target expect
+            os.chmod(temp_path, _target_mode(path))
+            with os.fdopen(fd, mode, encoding=encoding if 'b' not in mode else None) as f:
+                yield f
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        fsync_directory(directory)
+
+
+def write_text(path, text, lock=True):
+    with atomic_write(path, 'w', lock=lock, encoding='utf-8') as f:
+        f.write(text)
+
+
+def write_bytes(path, data, lock=True):
+    with atomic_write(path, 'wb', lock=lock) as f:
+        f.write(data)
+
+
+def write_json(path, data, lock=True, **kwargs):
+    with atomic_write(path, 'w', lock=lock, encoding='utf-8') as f:
+        json.dump(data, f, **kwargs)
+
+
+def write_csv(df, path, lock=True, **kwargs):
+    with atomic_write(path, 'w', lock=lock, encoding='utf-8') as f:
+        df.to_csv(f, **kwargs)
+
+
+def append_lines(path, lines, lock=True):
+    """Append whole lines under the lock and fsync, so concurrent appenders never interleave"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with (file_lock(path) if lock else _no_lock()):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(''.join(f"{line}\n" for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
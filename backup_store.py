@@ -0,0 +1,207 @@
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import atomic_io
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Content-defined chunk boundaries fall on line ends whose hash matches the mask
+MIN_CHUNK_BYTES = 16 * 1024
+MAX_CHUNK_BYTES = 256 * 1024
+BOUNDARY_MASK = 0x3F
+
+
+def split_chunks(data):
+    """Split bytes into content-defined chunks at line boundaries"""
+    chunks = []
+    current = []
+    size = 0
+    for line in io.BytesIO(data):
+        current.append(line)
+        size += len(line)
+        at_boundary = size >= MIN_CHUNK_BYTES and (zlib.crc32(line) & BOUNDARY_MASK) == 0
+        if at_boundary or size >= MAX_CHUNK_BYTES:
+            chunks.append(b''.join(current))
+            current = []
+            size = 0
+    if current:
+        chunks.append(b''.join(current))
+    return chunks
+
+
+class BackupStore:
+    """Content-addressed, deduplicated and compressed snapshot backups"""
+
+    def __init__(self, root_path='./data/backups', compression=None):
+        self.root_path = root_path
+        self.objects_path = os.path.join(root_path, 'objects')
+        self.manifests_path = os.path.join(root_path, 'manifests')
+        os.makedirs(self.objects_path, exist_ok=True)
+        os.makedirs(self.manifests_path, exist_ok=True)
+
+        compression = compression or os.getenv('BACKUP_COMPRESSION', 'zstd' if zstandard else 'gzip')
+        if compression == 'zstd' and zstandard is None:
+            logger.warning("zstandard not installed, falling back to gzip backups")
+            compression = 'gzip'
+        self.compression = compression
+
+    def _object_path(self, digest, extension):
+        return os.path.join(self.objects_path, digest[:2], f"{digest}.{extension}")
+
+    def _find_object(self, digest):
+        for extension in ('zst', 'gz'):
+            path = self._object_path(digest, extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put_chunk(self, data):
+        """Store a chunk unless an identical one exists; returns (digest, bytes_written)"""
+        digest = hashlib.sha256(data).hexdigest()
+        existing = self._find_object(digest)
+        if existing:
+            # Refresh the mtime so a concurrent garbage collection treats the chunk as live
+            os.utime(existing, None)
+            return digest, 0
+
+        if self.compression == 'zstd':
+            extension, payload = 'zst', zstandard.ZstdCompressor(level=10).compress(data)
+        else:
+            extension, payload = 'gz', gzip.compress(data, mtime=0)
+
+        path = self._object_path(digest, extension)
+        # Identical content makes concurrent writers harmless, so no lock is needed
+        atomic_io.write_bytes(path, payload, lock=False)
+        return digest, len(payload)
+
+    def get_chunk(self, digest):
+        path = self._find_object(digest)
+        if path is None:
+            raise FileNotFoundError(f"Backup chunk {digest} missing")
+        with open(path, 'rb') as f:
+            payload = f.read()
+        if path.endswith('.zst'):
+            return zstandard.ZstdDecompressor().decompress(payload)
+        return gzip.decompress(payload)
+
+    def backup_frames(self, frames, timestamp=None):
+        """Back up DataFrames column by column so unchanged columns are deduplicated"""
+        # Microseconds keep two backups taken in the same second from sharing a manifest
+        timestamp = timestamp or datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        manifest = {'timestamp': timestamp, 'tables': {}}
+        bytes_written = 0
+
+        for table_name, df in frames.items():
+            columns = []
+            for column in df.columns:
+                column_bytes = df[column].to_csv(index=False, header=False).encode()
+                digests = []
+                for chunk in split_chunks(column_bytes):
+                    digest, written = self.put_chunk(chunk)
+                    digests.append(digest)
+                    bytes_written += written
+                columns.append({'name': column, 'chunks': digests})
+            manifest['tables'][table_name] = {'rows': len(df), 'columns': columns}
+
+        manifest_path = os.path.join(self.manifests_path, f"{timestamp}.json")
+        atomic_io.write_json(manifest_path, manifest, lock=False)
+
+        logger.info(f"Backup {timestamp} stored, {bytes_written} new bytes written")
+        return manifest
+
+    def list_snapshots(self):
+        """Timestamps of every stored backup, oldest first"""
+        return sorted(name[:-len('.json')] for name in os.listdir(self.manifests_path) if name.endswith('.json'))
+
+    def load_manifest(self, timestamp):
+        with open(os.path.join(self.manifests_path, f"{timestamp}.json"), 'r') as f:
+            return json.load(f)
+
+    def restore(self, timestamp, target_dir=None):
+        """Rebuild the DataFrames of a backup, optionally writing them as CSV files"""
+        manifest = self.load_manifest(timestamp)
+        frames = {}
+
+        for table_name, table in manifest['tables'].items():
+            series = []
+            for column in table['columns']:
+                column_bytes = b''.join(self.get_chunk(digest) for digest in column['chunks'])
+                if table['rows'] == 0:
+                    series.append(pd.Series([], name=column['name'], dtype=object))
+                    continue
+                series.append(pd.read_csv(
+                    io.BytesIO(column_bytes), header=None, names=[column['name']], skip_blank_lines=False
+                )[column['name']])
+            frames[table_name] = pd.concat(series, axis=1) if series else pd.DataFrame()
+
+            if target_dir:
+                os.makedirs(target_dir, exist_ok=True)
+                atomic_io.write_csv(frames[table_name], os.path.join(target_dir, f"{table_name}.csv"), index=False)
+
+        return frames
+
+    def referenced_chunks(self):
+        """Digests referenced by any manifest"""
+        referenced = set()
+        for timestamp in self.list_snapshots():
+            for table in self.load_manifest(timestamp)['tables'].values():
+                for column in table['columns']:
+                    referenced.update(column['chunks'])
+        return referenced
+
+    def prune(self, retention_days, keep_latest=1):
+        """Delete manifests older than the retention window; the newest `keep_latest` always survive"""
+        cutoff = (datetime.now() - timedelta(days=retention_days)).strftime('%Y%m%d_%H%M%S')
+        snapshots = self.list_snapshots()
+        candidates = snapshots[:-keep_latest] if keep_latest else snapshots
+
+        removed = 0
+        for timestamp in candidates:
+            if timestamp < cutoff:
+                os.remove(os.path.join(self.manifests_path, f"{timestamp}.json"))
+                removed += 1
+
+        logger.info(f"Pruned {removed} backup manifests older than {cutoff}")
+        return removed
+
+    def collect_garbage(self, grace_seconds=3600):
+        """Delete chunk objects no manifest references; returns (objects_removed, bytes_freed)"""
+        referenced = self.referenced_chunks()
+        # Chunks written or reused by an in-progress backup have a fresh mtime and no manifest yet
+        grace_cutoff = time.time() - grace_seconds
+
+        removed = 0
+        freed = 0
+        for directory, _, names in os.walk(self.objects_path):
+            for name in names:
+                digest = name.split('.', 1)[0]
+                path = os.path.join(directory, name)
+                if digest in referenced or os.path.getmtime(path) > grace_cutoff:
+                    continue
+                freed += os.path.getsize(path)
+                os.remove(path)
+                removed += 1
+
+        logger.info(f"Removed {removed} unreferenced backup chunks, {freed} bytes freed")
+        return removed, freed
+
+    def disk_usage(self):
+        """Bytes used by chunk objects and manifests"""
+        total = 0
+        for directory, _, names in os.walk(self.root_path):
+            total += sum(os.path.getsize(os.path.join(directory, name)) for name in names)
+        return total
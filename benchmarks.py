@@ -0,0 +1,513 @@
+import argparse
+import logging
+import time
+
+from rate_limiter import TokenBucket
+from response_cache import ResponseCache
+from stub_servers import start_notion_stub, start_social_media_stub, start_webhook_stub
+from social_media_connector import SocialMediaConnector
+
+
+def make_brand_config(brand_count):
+    """Build a synthetic brand configuration with every platform"""
+    return {
+        f"Brand {i:04d}": {
+            "linkedin_id": f"brand-{i}",
+            "instagram_id": f"brand_{i}",
+            "facebook_id": f"Brand{i}",
+            "tiktok_id": f"brand{i}"
+        }
+        for i in range(brand_count)
+    }
+
+
+def stub_social_connector(server):
+    """Point a SocialMediaConnector at a local stub server"""
+    connector = SocialMediaConnector()
+    connector.linkedin_api_url = server.base_url
+    connector.instagram_api_url = server.base_url
+    connector.facebook_api_url = server.base_url
+    connector.tiktok_api_url = server.base_url
+
+    # The stub has no quota, so pacing would only measure the limiter
+    connector.rate_limiters = {
+        platform: TokenBucket(platform, rate_per_minute=1e9, burst=1e6)
+        for platform in connector.rate_limiters
+    }
+
+    # Every run should reach the stub rather than the response cache
+    connector.response_cache = ResponseCache(ttls={platform: 0 for platform in connector.rate_limiters})
+
+    # Measure the account lookups only, not post pagination
+    connector.engagement_enabled = False
+    return connector
+
+
+def benchmark_refresh(args):
+    """Compare sequential and concurrent refresh wall-clock time against a stub server"""
+    server = start_social_media_stub(latency=args.latency / 1000)
+    connector = stub_social_connector(server)
+    platform_concurrency = {platform: args.platform_concurrency for platform in connector.platform_concurrency}
+
+    print(f"Stub latency: {args.latency}ms per request, "
+          f"concurrency: {args.concurrency} global / {args.platform_concurrency} per platform")
+    print(f"{'brands':>8} {'requests':>9} {'sequential_s':>13} {'concurrent_s':>13} {'speedup':>8}")
+
+    try:
+        for brand_count in args.brands:
+            brand_config = make_brand_config(brand_count)
+
+            sequential = None
+            if brand_count <= args.max_sequential:
+                start = time.perf_counter()
+                connector.refresh_all_brand_data(brand_config)
+                sequential = time.perf_counter() - start
+
+            server.reset_counters()
+            start = time.perf_counter()
+            connector.refresh_all_brand_data_concurrent(
+                brand_config,
+                max_concurrency=args.concurrency,
+                platform_concurrency=platform_concurrency
+            )
+            concurrent = time.perf_counter() - start
+
+            sequential_text = f"{sequential:13.2f}" if sequential is not None else f"{'skipped':>13}"
+            speedup_text = f"{sequential / concurrent:7.1f}x" if sequential is not None else f"{'-':>8}"
+            print(f"{brand_count:>8} {server.request_count:>9} {sequential_text} {concurrent:13.2f} {speedup_text}")
+    finally:
+        server.stop()
+
+
+def benchmark_batch(args):
+    """Count round trips for per-page versus batched Graph API refreshes"""
+    server = start_social_media_stub(latency=args.latency / 1000)
+    connector = stub_social_connector(server)
+    brand_config = make_brand_config(args.brands)
+
+    try:
+        start = time.perf_counter()
+        individual = connector.refresh_all_brand_data(brand_config)
+        individual_time = time.perf_counter() - start
+        individual_requests = server.request_count
+
+        server.reset_counters()
+        start = time.perf_counter()
+        batched = connector.refresh_all_brand_data_batched(brand_config)
+        batched_time = time.perf_counter() - start
+        batched_requests = server.request_count
+        batched_by_path = dict(server.requests_by_path)
+    finally:
+        server.stop()
+
+    # Both modes must produce the same brands and platforms
+    shape = lambda data: {brand: sorted(metrics) for brand, metrics in data.items()}
+    assert shape(individual) == shape(batched), "Batched refresh returned a different shape"
+
+    print(f"Brands: {args.brands} (LinkedIn + Instagram + Facebook + TikTok each)")
+    print(f"{'mode':>10} {'requests':>9} {'seconds':>8}")
+    print(f"{'per-page':>10} {individual_requests:>9} {individual_time:8.2f}")
+    print(f"{'batched':>10} {batched_requests:>9} {batched_time:8.2f}")
+    print(f"Batched requests by endpoint: {batched_by_path.get('GET /', 0)} Instagram ?ids=, "
+          f"{batched_by_path.get('POST /', 0)} Facebook batch POST")
+
+
+def benchmark_trends(args):
+    """Time indexed trend queries against a boolean-mask scan on synthetic history"""
+    import numpy as np
+    import pandas as pd
+    from metric_query import TrendIndex
+
+    rng = np.random.default_rng(42)
+    brands = [f"Brand {i:04d}" for i in range(args.brand_count)]
+    metrics = ['website_traffic', 'social_followers', 'engagement_rate', 'operational_value']
+
+    start = time.perf_counter()
+    df = pd.DataFrame({
+        'brand_name': pd.Categorical.from_codes(rng.integers(0, len(brands), args.rows), brands),
+        'metric_name': pd.Categorical.from_codes(rng.integers(0, len(metrics), args.rows), metrics),
+        'metric_value': rng.random(args.rows) * 1000,
+        'timestamp': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365 * 24 * 4, args.rows) * 15, unit='min')
+    })
+    print(f"Generated {args.rows:,} rows ({len(brands)} brands x {len(metrics)} metrics) in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    index = TrendIndex.from_frame(df)
+    print(f"Index build: {time.perf_counter() - start:.2f}s")
+
+    def timed(fn, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    brand, metric = brands[7], metrics[1]
+    pairs = [(b, m) for b in brands[:25] for m in metrics]
+
+    results = [
+        ('last 12 periods', timed(lambda: index.query_last(brand, metric, 12), 1000)),
+        ('30-day range', timed(lambda: index.query_range(brand, metric, '2023-03-01', '2023-03-31'), 1000)),
+        (f'batch last 12 x {len(pairs)} pairs', timed(lambda: index.query_batch(pairs, periods=12), 20)),
+        ('full scan + mask (previous)', timed(
+            lambda: df[(df['brand_name'] == brand) & (df['metric_name'] == metric)].sort_values('timestamp').tail(12), 3
+        ))
+    ]
+    for name, ms in results:
+        print(f"{name:>32}: {ms:10.3f} ms")
+
+
+def benchmark_ingest(args):
+    """Stream a synthetic leads file into the metric store and report throughput and peak memory"""
+    import os
+    import resource
+    import tempfile
+    import numpy as np
+    import pandas as pd
+    from metric_store import MetricStore
+    from streaming_ingest import StreamingIngestor
+
+    def peak_rss_mb():
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    work_dir = tempfile.mkdtemp(prefix='ingest-bench-')
+    leads_path = os.path.join(work_dir, 'leads_data.csv')
+    rng = np.random.default_rng(7)
+    brands = [f"Brand {i:04d}" for i in range(args.brand_count)]
+    statuses = ['new', 'contacted', 'qualified', 'converted', 'lost']
+
+    start = time.perf_counter()
+    written = 0
+    while written < args.rows:
+        count = min(200_000, args.rows - written)
+        pd.DataFrame({
+            'lead_id': [f"L{written + i}" for i in range(count)],
+            'brand_name': np.array(brands)[rng.integers(0, len(brands), count)],
+            'source': 'website',
+            'status': np.array(statuses)[rng.integers(0, len(statuses), count)],
+            'created_at': (pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365 * 86400, count), unit='s')).astype(str),
+            'notes': 'x' * 40
+        }).to_csv(leads_path, mode='a', header=written == 0, index=False)
+        written += count
+    size_mb = os.path.getsize(leads_path) / 1024 ** 2
+    print(f"Generated {args.rows:,} leads ({size_mb:.0f} MB) in {time.perf_counter() - start:.1f}s")
+
+    baseline = peak_rss_mb()
+    ingestor = StreamingIngestor(
+        work_dir, MetricStore(os.path.join(work_dir, 'metric_store')),
+        state_path=os.path.join(work_dir, 'ingest_state.json'), chunk_rows=args.chunk_rows
+    )
+    result = ingestor.ingest('leads')
+    print(f"Streaming: {result['rows']:,} rows in {result['chunks']} chunks, {result['seconds']:.1f}s, "
+          f"{result['rows_per_sec']:,} rows/s, {result['metric_rows']:,} metric rows "
+          f"written in {result['write_seconds']:.1f}s, "
+          f"peak RSS {peak_rss_mb():.0f} MB (baseline {baseline:.0f} MB)")
+
+    if args.compare_full:
+        start = time.perf_counter()
+        pd.read_csv(leads_path)
+        print(f"Full read_csv: {time.perf_counter() - start:.1f}s, peak RSS {peak_rss_mb():.0f} MB")
+
+
+def benchmark_snapshot(args):
+    """Compare snapshot size and save/load time for each format against the original indented JSON"""
+    import json
+    import os
+    import tempfile
+    import snapshot_format
+    from social_media_connector import load_metrics_from_file, save_metrics_to_file
+
+    snapshot = {
+        brand: {
+            'linkedin': {'platform': 'linkedin', 'followers': 1000 + i, 'engagement_rate': 2.5,
+                         'posts_last_30_days': 12, 'last_updated': '2025-07-01T10:00:00'},
+            'instagram': {'platform': 'instagram', 'followers': 5000 + i, 'following': 300, 'media_count': 410,
+                          'engagement_rate': 3.1, 'last_updated': '2025-07-01T10:00:00'},
+            'facebook': {'platform': 'facebook', 'followers': 8000 + i, 'page_likes': 7900, 'engagement_rate': 1.2,
+                         'last_updated': '2025-07-01T10:00:00'},
+            'tiktok': {'platform': 'tiktok', 'followers': 12000 + i, 'likes': 50000, 'video_count': 95,
+                       'engagement_rate': 6.4, 'last_updated': '2025-07-01T10:00:00'}
+        }
+        for i, brand in enumerate(make_brand_config(args.brands))
+    }
+
+    work_dir = tempfile.mkdtemp(prefix='snapshot-bench-')
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            result = fn()
+        return (time.perf_counter() - start) / args.repeat * 1000, result
+
+    # The original writer: stdlib json with indent=2
+    baseline_path = os.path.join(work_dir, 'baseline.json')
+    def save_baseline():
+        with open(baseline_path, 'w') as f:
+            json.dump(snapshot, f, indent=2)
+    def load_baseline():
+        with open(baseline_path, 'r') as f:
+            return json.load(f)
+
+    rows = [('json (stdlib, previous)', baseline_path, save_baseline, load_baseline)]
+    formats = [('json (orjson)' if snapshot_format.orjson else 'json', 'snapshot.json')]
+    if snapshot_format.msgpack:
+        formats.append(('msgpack', 'snapshot.msgpack'))
+    for name, filename in formats:
+        path = os.path.join(work_dir, filename)
+        rows.append((name, path, lambda path=path: save_metrics_to_file(snapshot, path),
+                     lambda path=path: load_metrics_from_file(path)))
+
+    print(f"Snapshot of {args.brands} brands x 4 platforms, mean of {args.repeat} runs")
+    print(f"{'format':>24} {'size_kb':>9} {'save_ms':>9} {'load_ms':>9}")
+    for name, path, save, load in rows:
+        save_ms, _ = timed(save)
+        load_ms, loaded = timed(load)
+        assert loaded == snapshot, f"{name} snapshot did not round-trip"
+        print(f"{name:>24} {os.path.getsize(path) / 1024:9.0f} {save_ms:9.1f} {load_ms:9.1f}")
+
+
+def benchmark_notion(args):
+    """Drive DashboardAutomation.daily_data_sync against the Notion stub: initial creates, then upserts"""
+    import os
+    import tempfile
+
+    server = start_notion_stub(
+        latency=args.latency / 1000, rate_per_second=args.rate, burst=args.burst,
+        throttle_probability=args.throttle, seed=1
+    )
+
+    # Keep the automation's data files and log inside a scratch directory
+    work_dir = tempfile.mkdtemp(prefix='notion-bench-')
+    os.chdir(work_dir)
+    os.environ.update({
+        'NOTION_API_URL': f"{server.base_url}/v1",
+        'NOTION_DATABASE_ID': 'benchmark-db',
+        'NOTION_RATE_LIMIT_PER_SECOND': str(args.rate),
+        'NOTION_MAX_CONCURRENCY': str(args.concurrency),
+        'DATA_TRACKER_REPO_PATH': work_dir,
+        'METRICS_SNAPSHOT_PATH': os.path.join(work_dir, 'snapshot.json')
+    })
+    import dashboard_automation
+    from social_media_connector import save_metrics_to_file
+    logging.disable(logging.WARNING)
+
+    automation = dashboard_automation.DashboardAutomation()
+    automation.brand_config = {
+        brand_name: {'category': ['Travel', 'Real Estate', 'Retail', 'Media'][i % 4]}
+        for i, brand_name in enumerate(make_brand_config(args.brands))
+    }
+
+    def snapshot(changed_every):
+        return {
+            brand_name: {
+                'category': config['category'],
+                'insight': f"Updated metrics for {brand_name}",
+                'website_traffic': 1000 + i + (1 if changed_every and i % changed_every == 0 else 0),
+                'social_followers': 5000 + i,
+                'metrics': {
+                    'website_traffic': 1000 + i, 'primary_social_platform': 'instagram', 'social_followers': 5000 + i,
+                    'engagement_rate': 2.5, 'operational_metric': 'visits', 'operational_value': i
+                }
+            }
+            for i, (brand_name, config) in enumerate(automation.brand_config.items())
+        }
+
+    print(f"Brands: {args.brands}, rate limit: {args.rate} req/s, stub latency: {args.latency}ms, "
+          f"429 injection: {args.throttle:.0%}, concurrency: {args.concurrency}")
+    print(f"{'run':>22} {'requests':>9} {'retries':>8} {'seconds':>8} {'minimum_s':>10}")
+
+    try:
+        for name, changed_every in (('initial (creates)', 0), (f'upsert (1 in {args.change_every})', args.change_every)):
+            save_metrics_to_file(snapshot(changed_every), dashboard_automation.SNAPSHOT_PATH)
+            server.reset_counters()
+            start = time.perf_counter()
+            automation.daily_data_sync()
+            elapsed = time.perf_counter() - start
+            print(f"{name:>22} {server.request_count:>9} {server.throttled:>8} {elapsed:8.1f} "
+                  f"{server.request_count / args.rate:10.1f}")
+    finally:
+        server.stop()
+
+    pages = len(server.pages)
+    print(f"Pages in stub database: {pages} (duplicates: {pages - args.brands})")
+
+
+def benchmark_outbox(args):
+    """Enqueue latency and delivery of webhooks through the outbox, with a restart halfway through"""
+    import os
+    import statistics
+    import tempfile
+
+    os.environ['OUTBOX_RETRY_BASE_DELAY'] = '0.05'
+    from webhook_outbox import WebhookOutbox
+    logging.disable(logging.ERROR)
+
+    server = start_webhook_stub(latency=args.latency / 1000, failure_probability=args.failures, seed=1)
+    path = os.path.join(tempfile.mkdtemp(prefix='outbox-bench-'), 'outbox.db')
+    destinations = ['power_automate', 'n8n', 'make']
+
+    enqueue_times = []
+    start = time.perf_counter()
+    outbox = WebhookOutbox(path, workers=args.workers).start()
+    for sequence in range(args.events):
+        if sequence == args.events // 2:
+            # Simulated restart: a fresh outbox on the same file picks up what is still pending
+            outbox.stop()
+            pending_at_restart = outbox.pending_count()
+            outbox = WebhookOutbox(path, workers=args.workers).start()
+        destination = destinations[sequence % len(destinations)]
+        enqueued = time.perf_counter()
+        outbox.enqueue(destination, f"{server.base_url}/{destination}", {'sequence': sequence, 'alert_type': 'benchmark'})
+        enqueue_times.append(time.perf_counter() - enqueued)
+
+    drained = outbox.wait_until_drained(timeout=args.timeout)
+    elapsed = time.perf_counter() - start
+    outbox.stop()
+    server.stop()
+
+    enqueue_us = sorted(t * 1e6 for t in enqueue_times)
+    print(f"Events: {args.events}, workers: {args.workers}, stub latency: {args.latency}ms, "
+          f"503 injection: {args.failures:.0%}")
+    print(f"Enqueue: mean {statistics.mean(enqueue_us):.0f}us, p99 {enqueue_us[int(len(enqueue_us) * 0.99) - 1]:.0f}us, "
+          f"caller total {sum(enqueue_times):.3f}s (synchronous posting: >= {args.events * args.latency / 1000:.1f}s)")
+    print(f"Delivered in {elapsed:.1f}s (drained: {drained}), pending at restart: {pending_at_restart}, "
+          f"503s retried: {server.failures}, outbox: {outbox.stats()}")
+
+    keys = [delivery['idempotency_key'] for delivery in server.deliveries]
+    in_order = all(
+        [d['payload']['sequence'] for d in server.deliveries if d['path'] == f"/{destination}"] ==
+        sorted(d['payload']['sequence'] for d in server.deliveries if d['path'] == f"/{destination}")
+        for destination in destinations
+    )
+    print(f"Accepted deliveries: {len(keys)}, duplicates: {len(keys) - len(set(keys))}, "
+          f"in order per destination: {in_order}")
+
+
+def benchmark_fanout(args):
+    """Weekly report and alert delivery, one destination after another vs the concurrent fan-out dispatcher"""
+    import os
+
+    latencies = {'power_automate': args.latency, 'n8n': args.latency * 2, 'make': args.hang}
+    servers = {name: start_webhook_stub(latency=latency / 1000) for name, latency in latencies.items()}
+    os.environ.update({
+        'WEBHOOK_DELIVERY': 'sync',
+        'POWER_AUTOMATE_WEBHOOK': f"{servers['power_automate'].base_url}/flow",
+        'N8N_WEBHOOK': f"{servers['n8n'].base_url}/webhook",
+        'MAKE_WEBHOOK': f"{servers['make'].base_url}/scenario",
+        'WEBHOOK_TIMEOUT_SECONDS': str(args.timeout)
+    })
+    from workflow_automation import WorkflowAutomation
+    logging.disable(logging.CRITICAL)
+
+    automation = WorkflowAutomation()
+    brands = {
+        brand_name: {
+            'category': 'Retail',
+            'insight': f"Insight for {brand_name}",
+            # Low traffic and engagement: two alerts per brand
+            'metrics': {'website_traffic': 5000, 'social_followers': 1000, 'engagement_rate': 1.5}
+        }
+        for brand_name in make_brand_config(args.brands)
+    }
+
+    print(f"Stub latency ms: {latencies}, per-destination timeout: {args.timeout}s, brands: {args.brands}")
+    try:
+        report_data = automation.create_weekly_report_data(brands)
+        start = time.perf_counter()
+        automation.trigger_power_automate_flow("Portfolio", report_data, "weekly_report")
+        automation.trigger_n8n_workflow(report_data, "weekly_report")
+        automation.trigger_make_scenario(report_data, "weekly_report")
+        print(f"Weekly report, sequential: {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        results = automation.trigger_weekly_report_workflows(brands)
+        print(f"Weekly report, fan-out:    {time.perf_counter() - start:.2f}s")
+        for name, result in results.items():
+            print(f"  {name:>15}: success={result['success']} latency_ms={result['latency_ms']} error={result['error']}")
+
+        alerts = [
+            (brand_name, brand_data['metrics'], alert['type'])
+            for brand_name, brand_data in brands.items()
+            for alert in automation.check_performance_thresholds(brand_name, brand_data['metrics'])
+        ]
+        start = time.perf_counter()
+        for alert in alerts:
+            automation.trigger_power_automate_flow(*alert)
+        print(f"{len(alerts)} alerts, sequential: {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        sent = automation.send_performance_alerts(brands)
+        print(f"{len(sent)} alerts, fan-out:    {time.perf_counter() - start:.2f}s")
+    finally:
+        for server in servers.values():
+            server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Brand dashboard performance benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    refresh_parser = subparsers.add_parser('refresh', help="Social media refresh scaling")
+    refresh_parser.add_argument('--brands', type=int, nargs='+', default=[5, 50, 100, 500])
+    refresh_parser.add_argument('--latency', type=float, default=20.0, help="Stub latency in ms")
+    refresh_parser.add_argument('--concurrency', type=int, default=64)
+    refresh_parser.add_argument('--platform-concurrency', type=int, default=16)
+    refresh_parser.add_argument('--max-sequential', type=int, default=100,
+                                help="Skip the sequential run above this many brands")
+    refresh_parser.set_defaults(func=benchmark_refresh)
+
+    batch_parser = subparsers.add_parser('batch', help="Graph API batch request round trips")
+    batch_parser.add_argument('--brands', type=int, default=200)
+    batch_parser.add_argument('--latency', type=float, default=20.0, help="Stub latency in ms")
+    batch_parser.set_defaults(func=benchmark_batch)
+
+    trends_parser = subparsers.add_parser('trends', help="Historical trend query latency")
+    trends_parser.add_argument('--rows', type=int, default=10_000_000)
+    trends_parser.add_argument('--brand-count', type=int, default=500)
+    trends_parser.set_defaults(func=benchmark_trends)
+
+    ingest_parser = subparsers.add_parser('ingest', help="Chunked streaming ingestion of a large leads file")
+    ingest_parser.add_argument('--rows', type=int, default=5_000_000)
+    ingest_parser.add_argument('--brand-count', type=int, default=200)
+    ingest_parser.add_argument('--chunk-rows', type=int, default=250_000)
+    ingest_parser.add_argument('--compare-full', action='store_true',
+                               help="Also time a full pd.read_csv after the streaming run")
+    ingest_parser.set_defaults(func=benchmark_ingest)
+
+    snapshot_parser = subparsers.add_parser('snapshot', help="Metrics snapshot size and load time by format")
+    snapshot_parser.add_argument('--brands', type=int, default=5000)
+    snapshot_parser.add_argument('--repeat', type=int, default=5)
+    snapshot_parser.set_defaults(func=benchmark_snapshot)
+
+    notion_parser = subparsers.add_parser('notion', help="Notion brand book sync against a rate-limited stub")
+    notion_parser.add_argument('--brands', type=int, default=1000)
+    notion_parser.add_argument('--rate', type=float, default=3.0, help="Requests per second allowed by the stub")
+    notion_parser.add_argument('--burst', type=int, default=10, help="Requests the stub admits above the average rate")
+    notion_parser.add_argument('--latency', type=float, default=150.0, help="Stub latency in ms")
+    notion_parser.add_argument('--throttle', type=float, default=0.01, help="Fraction of requests answered with 429")
+    notion_parser.add_argument('--concurrency', type=int, default=8)
+    notion_parser.add_argument('--change-every', type=int, default=20,
+                               help="In the second run, change one brand in this many")
+    notion_parser.set_defaults(func=benchmark_notion)
+
+    outbox_parser = subparsers.add_parser('outbox', help="Webhook outbox enqueue latency and delivery")
+    outbox_parser.add_argument('--events', type=int, default=600)
+    outbox_parser.add_argument('--workers', type=int, default=4)
+    outbox_parser.add_argument('--latency', type=float, default=200.0, help="Stub latency in ms")
+    outbox_parser.add_argument('--failures', type=float, default=0.05, help="Fraction of deliveries rejected with 503")
+    outbox_parser.add_argument('--timeout', type=float, default=300.0, help="Seconds to wait for the outbox to drain")
+    outbox_parser.set_defaults(func=benchmark_outbox)
+
+    fanout_parser = subparsers.add_parser('fanout', help="Concurrent webhook fan-out vs sequential delivery")
+    fanout_parser.add_argument('--brands', type=int, default=20)
+    fanout_parser.add_argument('--latency', type=float, default=300.0, help="Power Automate stub latency in ms (n8n: 2x)")
+    fanout_parser.add_argument('--hang', type=float, default=5000.0, help="Make stub latency in ms")
+    fanout_parser.add_argument('--timeout', type=float, default=2.0, help="Per-destination timeout in seconds")
+    fanout_parser.set_defaults(func=benchmark_fanout)
+
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import io
+import json
+import logging
+import os
+from datetime import datetime
+
+import pandas as pd
+
+import atomic_io
+
+logger = logging.getLogger(__name__)
+
+# Row identity and the columns that change on every sync without meaning a real change
+TABLE_KEYS = {
+    'brands': ['brand_name'],
+    'metrics': ['brand_name', 'metric_name']
+}
+
+VOLATILE_COLUMNS = {
+    'brands': ['last_updated'],
+    'metrics': ['timestamp']
+}
+
+
+def as_text(df):
+    """The frame exactly as its CSV cells would read back, so comparisons ignore dtype drift"""
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)), dtype=str, keep_default_na=False)
+
+
+def read_text_csv(file_path):
+    if not os.path.exists(file_path):
+        return None
+    return pd.read_csv(file_path, dtype=str, keep_default_na=False)
+
+
+def diff_frames(old, new, keys, volatile_columns=()):
+    """Split new vs old into insert/update/delete change records keyed by `keys`"""
+    if old is None or old.empty:
+        return [{'op': 'insert', 'key': row[keys].tolist(), 'row': row.to_dict()} for _, row in new.iterrows()]
+
+    compared = [column for column in new.columns if column not in keys and column not in volatile_columns]
+    merged = old.merge(new, on=keys, how='outer', suffixes=('_old', ''), indicator=True)
+
+    changes = []
+    for _, row in merged[merged['_merge'] == 'right_only'].iterrows():
+        changes.append({'op': 'insert', 'key': row[keys].tolist(), 'row': row[new.columns].to_dict()})
+    for _, row in merged[merged['_merge'] == 'left_only'].iterrows():
+        changes.append({'op': 'delete', 'key': row[keys].tolist()})
+
+    both = merged[merged['_merge'] == 'both']
+    changed = pd.Series(False, index=both.index)
+    for column in compared:
+        old_column = f"{column}_old"
+        # A column the persisted file lacks counts as a change for every row
+        changed |= both[column] != both[old_column] if old_column in both.columns else True
+    for _, row in both[changed].iterrows():
+        changes.append({'op': 'update', 'key': row[keys].tolist(), 'row': row[new.columns].to_dict()})
+
+    return changes
+
+
+def apply_changes(state, changes, keys, columns):
+    """Apply change records to a persisted table, keeping unchanged rows and their order"""
+    if state is None:
+        state = pd.DataFrame(columns=columns)
+
+    key_index = {tuple(row): position for position, row in enumerate(state[keys].itertuples(index=False, name=None))}
+    rows = state.reindex(columns=columns).to_dict('records')
+    deleted = set()
+
+    for change in changes:
+        position = key_index.get(tuple(change['key']))
+        if change['op'] == 'delete':
+            if position is not None:
+                deleted.add(position)
+        elif position is not None:
+            rows[position] = change['row']
+        else:
+            key_index[tuple(change['key'])] = len(rows)
+            rows.append(change['row'])
+
+    return pd.DataFrame([row for position, row in enumerate(rows) if position not in deleted], columns=columns)
+
+
+class ChangeCaptureSync:
+    """Write only inserted/updated/deleted rows' effects to the Data-tracker CSVs, with a changelog"""
+
+    def __init__(self, repo_path, changelog_name='dashboard_changelog.jsonl'):
+        self.repo_path = repo_path
+        self.changelog_path = os.path.join(repo_path, changelog_name)
+        # Last persisted text state per table, so repeated syncs skip re-reading the CSVs
+        self._state = {}
+
+    def table_path(self, table_name):
+        return os.path.join(self.repo_path, f"dashboard_{table_name}.csv")
+
+    def _file_version(self, table_name):
+        try:
+            stat = os.stat(self.table_path(table_name))
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def persisted_state(self, table_name):
+        """Cached text state of a table, re-read only if the file changed underneath us"""
+        version = self._file_version(table_name)
+        cached = self._state.get(table_name)
+        if cached is None or cached[0] != version:
+            self._state[table_name] = (version, read_text_csv(self.table_path(table_name)))
+        return self._state[table_name][1]
+
+    def sync_table(self, table_name, df):
+        """Diff a fresh frame against the persisted table; rewrite it only if something changed"""
+        new = as_text(df)
+        keys = TABLE_KEYS[table_name]
+
+        # Held across read, diff and write so another instance cannot sync in between
+        with atomic_io.file_lock(self.table_path(table_name)):
+            old = self.persisted_state(table_name)
+            changes = diff_frames(old, new, keys, VOLATILE_COLUMNS.get(table_name, ()))
+            if not changes:
+                return []
+
+            state = apply_changes(old, changes, keys, list(new.columns))
+            atomic_io.write_csv(state, self.table_path(table_name), lock=False, index=False)
+            self._state[table_name] = (self._file_version(table_name), state)
+        return changes
+
+    def write_changelog(self, table_name, changes, synced_at):
+        atomic_io.append_lines(
+            self.changelog_path,
+            [json.dumps({'table': table_name, 'synced_at': synced_at, **change}) for change in changes]
+        )
+
+    def sync(self, frames):
+        """Sync several tables; returns change counts per table and operation"""
+        synced_at = datetime.now().isoformat()
+        summary = {}
+        for table_name, df in frames.items():
+            changes = self.sync_table(table_name, df)
+            if changes:
+                self.write_changelog(table_name, changes, synced_at)
+
+            counts = {'insert': 0, 'update': 0, 'delete': 0}
+            for change in changes:
+                counts[change['op']] += 1
+            summary[table_name] = counts
+
+        logger.info(f"Change-data-capture sync: {summary}")
+        return summary
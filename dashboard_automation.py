@@ -1,11 +1,12 @@
 
 import schedule
 import time
+import os
 import logging
-from datetime import datetime
 from social_media_connector import SocialMediaConnector, save_metrics_to_file, load_metrics_from_file
 from data_integration import DataTrackerConnector, NotionDatabaseConnector
 from workflow_automation import WorkflowAutomation
+import resilience
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,6 +23,9 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Latest refresh snapshot; a .msgpack extension selects the compact binary format
+SNAPSHOT_PATH = os.getenv('METRICS_SNAPSHOT_PATH', 'data/social_metrics_latest.json')
+
 class DashboardAutomation:
     """Main automation orchestrator for the brand dashboard"""
 
@@ -47,6 +51,8 @@ class DashboardAutomation:
                 "instagram_id": "travel.xec",
                 "facebook_id": "TravelXec",
                 "linkedin_id": "travelxec",
+                # TikTok Business API business_id (numeric), not the @handle
+                "tiktok_id": os.getenv('TRAVELXEC_TIKTOK_BUSINESS_ID'),
                 "category": "Online Travel Services"
             },
             "Schmooze Media": {
@@ -61,6 +67,12 @@ class DashboardAutomation:
             }
         }
 
+        # Accounts without a configured ID are skipped
+        self.brand_config = {
+            brand_name: {key: value for key, value in config.items() if value}
+            for brand_name, config in self.brand_config.items()
+        }
+
         logger.info("Dashboard automation initialized")
 
     def hourly_social_media_refresh(self):
@@ -68,11 +80,19 @@ class DashboardAutomation:
         try:
             logger.info("Starting hourly social media data refresh")
 
-            updated_metrics = self.social_connector.refresh_all_brand_data(self.brand_config)
+            # Batched mode packs Instagram and Facebook lookups into multi-id and batch requests
+            if os.getenv('SOCIAL_REFRESH_MODE', 'batched').lower() == 'batched':
+                updated_metrics = self.social_connector.refresh_all_brand_data_batched(self.brand_config)
+            else:
+                updated_metrics = self.social_connector.refresh_all_brand_data_concurrent(self.brand_config)
 
             if updated_metrics:
-                save_metrics_to_file(updated_metrics, 'data/social_metrics_latest.json')
+                save_metrics_to_file(updated_metrics, SNAPSHOT_PATH)
                 logger.info("Social media data refreshed successfully")
+                logger.info(f"Rate limiter stats: {self.social_connector.rate_limit_stats()}")
+                logger.info(f"Response cache stats: {self.social_connector.cache_stats()}")
+                logger.info(f"Circuit breaker states: {resilience.breaker_states()}")
+                logger.info(f"Request coalescing stats: {self.social_connector.coalescing_stats()}")
 
                 # Trigger workflow notifications for significant changes
                 self.workflow_automation.send_performance_alerts(updated_metrics)
@@ -88,20 +108,26 @@ class DashboardAutomation:
             logger.info("Starting daily data synchronization")
 
             # Load latest social media data
-            latest_metrics = load_metrics_from_file('data/social_metrics_latest.json')
+            latest_metrics = load_metrics_from_file(SNAPSHOT_PATH)
 
             # Sync with Data-tracker repository
             if self.data_tracker.sync_with_repository(latest_metrics):
                 logger.info("Data-tracker sync completed")
 
-            # Update Notion database
-            for brand_name, brand_data in latest_metrics.items():
-                if brand_name in self.brand_config:
-                    self.notion_connector.create_brand_book_entry(brand_name, {
-                        'category': self.brand_config[brand_name]['category'],
-                        'metrics': brand_data,
-                        'insight': f"Updated metrics for {brand_name} on {datetime.now().strftime('%Y-%m-%d')}"
-                    })
+            # Fold the large leads/campaign files into the metric history (skipped when unchanged)
+            logger.info(f"Data-tracker ingestion: {self.data_tracker.ingest_large_tables()}")
+
+            # Update Notion database (existing pages are patched only where they changed),
+            # pipelined at the Notion rate limit
+            self.notion_connector.sync_brand_books([
+                (brand_name, {
+                    'category': self.brand_config[brand_name]['category'],
+                    'metrics': brand_data,
+                    'insight': f"Updated metrics for {brand_name}"
+                })
+                for brand_name, brand_data in latest_metrics.items()
+                if brand_name in self.brand_config
+            ])
 
             logger.info("Daily synchronization completed")
 
@@ -114,7 +140,7 @@ class DashboardAutomation:
             logger.info("Starting weekly report generation")
 
             # Load current data
-            current_data = load_metrics_from_file('data/social_metrics_latest.json')
+            current_data = load_metrics_from_file(SNAPSHOT_PATH)
 
             # Trigger report workflows
             report_results = self.workflow_automation.trigger_weekly_report_workflows(current_data)
@@ -124,10 +150,25 @@ class DashboardAutomation:
         except Exception as e:
             logger.error(f"Error in weekly report generation: {str(e)}")
 
+    def daily_compaction(self):
+        """Nightly rollups, retention and compaction of the metric history and backups"""
+        try:
+            logger.info("Starting metric store compaction")
+            results = self.data_tracker.run_compaction()
+            if self.workflow_automation.outbox is not None:
+                results['webhooks_purged'] = self.workflow_automation.outbox.purge_delivered(
+                    int(os.getenv('OUTBOX_RETENTION_DAYS', '7'))
+                )
+            logger.info(f"Compaction results: {results}")
+
+        except Exception as e:
+            logger.error(f"Error in compaction: {str(e)}")
+
     def setup_schedule(self):
         """Setup the automation schedule"""
-        # Social media refresh every 6 hours
-        schedule.every(6).hours.do(self.hourly_social_media_refresh)
+        # Social media refresh, paced by the per-platform rate limiters
+        refresh_minutes = int(os.getenv('REFRESH_INTERVAL_MINUTES', '15'))
+        schedule.every(refresh_minutes).minutes.do(self.hourly_social_media_refresh)
 
         # Daily data sync at 9 AM IST
         schedule.every().day.at("09:00").do(self.daily_data_sync)
@@ -135,10 +176,14 @@ class DashboardAutomation:
         # Weekly reports on Monday at 10 AM IST
         schedule.every().monday.at("10:00").do(self.weekly_report_generation)
 
+        # Compaction and retention at 2 AM IST
+        schedule.every().day.at("02:00").do(self.daily_compaction)
+
         logger.info("Automation schedule configured:")
-        logger.info("- Social media refresh: Every 6 hours")
+        logger.info(f"- Social media refresh: Every {refresh_minutes} minutes")
         logger.info("- Data sync: Daily at 9:00 AM IST")
         logger.info("- Weekly reports: Monday at 10:00 AM IST")
+        logger.info("- Compaction: Daily at 2:00 AM IST")
 
     def run_automation(self):
         """Run the automation scheduler"""
@@ -162,6 +207,10 @@ class DashboardAutomation:
             logger.info("Automation stopped by user")
         except Exception as e:
             logger.error(f"Automation error: {str(e)}")
+        finally:
+            # Undelivered webhooks stay in the outbox and go out on the next start
+            if self.workflow_automation.outbox is not None:
+                self.workflow_automation.outbox.stop()
 
 def main():
     """Main function to start dashboard automation"""
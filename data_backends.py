@@ -0,0 +1,316 @@
+import logging
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+
+import pandas as pd
+
+import atomic_io
+from change_capture import ChangeCaptureSync
+from dataset_loader import TABLE_DATE_COLUMNS, TABLE_FILES, LazyDataset, apply_numeric_dtypes, parse_dtypes
+
+logger = logging.getLogger(__name__)
+
+BRAND_COLUMNS = [
+    'brand_name', 'category', 'website_traffic', 'primary_social_platform', 'social_followers',
+    'engagement_rate', 'leads', 'operational_metric', 'operational_value', 'insight', 'last_updated'
+]
+
+# Dashboard snapshots live beside the repository tables under the names the CSV backend writes
+SQLITE_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS dashboard_brands (
+        brand_name TEXT PRIMARY KEY,
+        category TEXT,
+        website_traffic REAL,
+        primary_social_platform TEXT,
+        social_followers REAL,
+        engagement_rate REAL,
+        leads REAL,
+        operational_metric TEXT,
+        operational_value REAL,
+        insight TEXT,
+        last_updated TEXT
+    )''',
+    '''CREATE TABLE IF NOT EXISTS dashboard_metrics (
+        brand_name TEXT NOT NULL,
+        metric_name TEXT NOT NULL,
+        metric_value REAL,
+        timestamp TEXT NOT NULL,
+        quarter TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS metrics_series ON dashboard_metrics (brand_name, metric_name, timestamp)',
+    'CREATE INDEX IF NOT EXISTS metrics_timestamp ON dashboard_metrics (timestamp)',
+    # Source file version of each imported repository table, so unchanged CSVs are not re-imported
+    '''CREATE TABLE IF NOT EXISTS repository_imports (
+        table_name TEXT PRIMARY KEY,
+        source_key TEXT NOT NULL,
+        rows INTEGER,
+        imported_at TEXT
+    )'''
+]
+
+# Databases written before the rename kept the dashboard snapshot under the repository table names
+LEGACY_DASHBOARD_TABLES = {
+    'brands': ('dashboard_brands', 'primary_social_platform'),
+    'metrics': ('dashboard_metrics', 'quarter')
+}
+
+
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def apply_table_dtypes(df, table_name):
+    """Give a table read back from SQLite the column types the CSV loader produces"""
+    df = df.astype(parse_dtypes(table_name, df.columns))
+    for column in TABLE_DATE_COLUMNS.get(table_name, []):
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+    return apply_numeric_dtypes(df, table_name)
+
+
+class CSVRepositoryBackend:
+    """Data-tracker backend over the CSV files in the repository directory"""
+
+    # Trend queries here scan a CSV, so the in-memory trend index is preferred
+    indexed_history = False
+
+    def __init__(self, repo_path, sync_mode='cdc'):
+        self.repo_path = repo_path
+        self.sync_mode = sync_mode
+        self.change_capture = ChangeCaptureSync(repo_path)
+
+    def load_tables(self, usecols=None, prefetch=None):
+        dataset = LazyDataset(
+            self.repo_path,
+            cache_dir='./data/processed',
+            usecols=usecols,
+            max_workers=int(os.getenv('DATA_LOAD_WORKERS', '4'))
+        )
+        if prefetch:
+            dataset.prefetch(prefetch)
+        return dataset
+
+    def write_snapshot(self, brands_df, metrics_df):
+        """Persist a synced snapshot; returns the number of changed rows"""
+        if self.sync_mode == 'full':
+            atomic_io.write_csv(brands_df, f'{self.repo_path}/dashboard_brands.csv', index=False)
+            atomic_io.write_csv(metrics_df, f'{self.repo_path}/dashboard_metrics.csv', index=False)
+            return len(brands_df) + len(metrics_df)
+
+        changes = self.change_capture.sync({'brands': brands_df, 'metrics': metrics_df})
+        return sum(sum(counts.values()) for counts in changes.values())
+
+    def history(self, brand_name, metric_name, periods=12, start=None, end=None):
+        metrics_file = f'{self.repo_path}/dashboard_metrics.csv'
+        if not os.path.exists(metrics_file):
+            return []
+        df = pd.read_csv(metrics_file)
+        df = df[(df['brand_name'] == brand_name) & (df['metric_name'] == metric_name)]
+        if start is not None:
+            df = df[pd.to_datetime(df['timestamp']) >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[pd.to_datetime(df['timestamp']) <= pd.Timestamp(end)]
+        return (df.tail(periods) if periods is not None else df).to_dict('records')
+
+
+class SQLiteDataset(Mapping):
+    """Dict-like handle over the SQLite tables that queries each one on first access"""
+
+    def __init__(self, backend, usecols=None):
+        self.backend = backend
+        self.usecols = usecols or {}
+        self._tables = {}
+
+    def __getitem__(self, table_name):
+        if table_name not in TABLE_FILES:
+            raise KeyError(table_name)
+        if table_name not in self._tables:
+            try:
+                self.backend.refresh_table(table_name)
+            except Exception as e:
+                # The previous import, if any, is still served
+                logger.error(f"Error importing {table_name} into {self.backend.path}: {str(e)}")
+            df = self.backend.read_table(table_name, self.usecols.get(table_name))
+            self._tables[table_name] = apply_table_dtypes(df, table_name)
+        return self._tables[table_name]
+
+    def __iter__(self):
+        return iter(TABLE_FILES)
+
+    def __len__(self):
+        return len(TABLE_FILES)
+
+
+class SQLiteDataBackend:
+    """Data-tracker backend in a WAL-mode SQLite database: one writer, many concurrent readers"""
+
+    indexed_history = True
+
+    def __init__(self, path='data/data_tracker.db', repo_path=None):
+        self.path = path
+        # Repository CSVs are imported on first access after they change
+        self.repo_path = repo_path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._import_lock = threading.Lock()
+
+        conn = self.connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        with conn:
+            for legacy_name, (table_name, marker_column) in LEGACY_DASHBOARD_TABLES.items():
+                if self.table_exists(legacy_name) and not self.table_exists(table_name):
+                    columns = [row[1] for row in conn.execute(f'PRAGMA table_info({quote_identifier(legacy_name)})')]
+                    if marker_column in columns:
+                        conn.execute(f'ALTER TABLE {quote_identifier(legacy_name)} RENAME TO {quote_identifier(table_name)}')
+                        logger.info(f"Renamed dashboard table {legacy_name} to {table_name} in {path}")
+            for statement in SQLITE_SCHEMA:
+                conn.execute(statement)
+
+    def connection(self):
+        """One connection per thread; WAL lets readers proceed while the writer commits"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    def table_exists(self, table_name):
+        row = self.connection().execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+        ).fetchone()
+        return row is not None
+
+    def read_table(self, table_name, usecols=None):
+        if not self.table_exists(table_name):
+            logger.warning(f"Table {table_name} not found in {self.path}")
+            return pd.DataFrame()
+        columns = ', '.join(map(quote_identifier, usecols)) if usecols else '*'
+        return pd.read_sql_query(f'SELECT {columns} FROM {quote_identifier(table_name)}', self.connection())
+
+    def load_tables(self, usecols=None, prefetch=None):
+        dataset = SQLiteDataset(self, usecols)
+        for table_name in prefetch or []:
+            dataset[table_name]
+        return dataset
+
+    def write_snapshot(self, brands_df, metrics_df):
+        """Upsert brands and append metric history in one transaction; returns the number of changed rows"""
+        brand_rows = brands_df.reindex(columns=BRAND_COLUMNS).astype(object).where(brands_df.notna(), None)
+        metric_rows = metrics_df.reindex(
+            columns=['brand_name', 'metric_name', 'metric_value', 'timestamp', 'quarter']
+        ).astype(object).where(metrics_df.notna(), None)
+
+        compared = [column for column in BRAND_COLUMNS if column not in ('brand_name', 'last_updated')]
+        updates = ', '.join(f'{column} = excluded.{column}' for column in BRAND_COLUMNS[1:])
+        # Unchanged brands keep their previous last_updated
+        changed = ' OR '.join(f'dashboard_brands.{column} IS NOT excluded.{column}' for column in compared)
+
+        with self._write_lock:
+            conn = self.connection()
+            with conn:
+                before = conn.total_changes
+                conn.executemany(
+                    f"INSERT INTO dashboard_brands ({', '.join(BRAND_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(BRAND_COLUMNS))}) "
+                    f"ON CONFLICT(brand_name) DO UPDATE SET {updates} WHERE {changed}",
+                    brand_rows.itertuples(index=False, name=None)
+                )
+                brand_names = brand_rows['brand_name'].tolist()
+                conn.execute(
+                    f"DELETE FROM dashboard_brands WHERE brand_name NOT IN ({', '.join('?' * len(brand_names))})",
+                    brand_names
+                )
+                conn.executemany(
+                    'INSERT INTO dashboard_metrics (brand_name, metric_name, metric_value, timestamp, quarter) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    metric_rows.itertuples(index=False, name=None)
+                )
+                return conn.total_changes - before
+
+    def import_csv(self, table_name, file_path, chunk_rows=100000, source_key=None):
+        """Bulk-load a repository CSV (e.g. campaigns, leads) into a table, replacing it"""
+        with self._write_lock:
+            conn = self.connection()
+            with conn:
+                conn.execute(f'DROP TABLE IF EXISTS {quote_identifier(table_name)}')
+                header = list(pd.read_csv(file_path, nrows=0).columns)
+                conn.execute(f'CREATE TABLE {quote_identifier(table_name)} ({", ".join(map(quote_identifier, header))})')
+
+                rows = 0
+                # Values keep their parsed types, so numeric columns read back as numbers
+                for chunk in pd.read_csv(file_path, chunksize=chunk_rows, dtype=parse_dtypes(table_name, header)):
+                    chunk = chunk.astype(object).where(chunk.notna(), None)
+                    conn.executemany(
+                        f'INSERT INTO {quote_identifier(table_name)} VALUES ({", ".join("?" * len(header))})',
+                        chunk.itertuples(index=False, name=None)
+                    )
+                    rows += len(chunk)
+
+                if source_key is not None:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO repository_imports (table_name, source_key, rows, imported_at) '
+                        'VALUES (?, ?, ?, ?)',
+                        (table_name, source_key, rows, pd.Timestamp.now().isoformat())
+                    )
+
+                # Indexed after the bulk insert, which is faster than maintaining it row by row
+                if 'brand_name' in header:
+                    conn.execute(
+                        f'CREATE INDEX {quote_identifier(table_name + "_brand")} ON {quote_identifier(table_name)} (brand_name)'
+                    )
+        logger.info(f"Imported {rows} rows from {file_path} into {table_name}")
+        return rows
+
+    def refresh_table(self, table_name):
+        """Import a repository CSV if it changed since its last import; returns True if it was imported"""
+        if not self.repo_path:
+            return False
+        file_path = os.path.join(self.repo_path, TABLE_FILES[table_name])
+        if not os.path.exists(file_path):
+            return False
+
+        stat = os.stat(file_path)
+        source_key = f"{stat.st_mtime_ns}:{stat.st_size}"
+        # Concurrent first accesses import a changed file once
+        with self._import_lock:
+            row = self.connection().execute(
+                'SELECT source_key FROM repository_imports WHERE table_name = ?', (table_name,)
+            ).fetchone()
+            if row is not None and row[0] == source_key:
+                return False
+            self.import_csv(table_name, file_path, source_key=source_key)
+        return True
+
+    def import_repository(self, tables=None):
+        """Copy the repository's changed CSV tables into the database"""
+        return {table_name: self.refresh_table(table_name) for table_name in tables or TABLE_FILES}
+
+    def history(self, brand_name, metric_name, periods=12, start=None, end=None):
+        """Latest rows of one series, served from the (brand_name, metric_name, timestamp) index"""
+        # ISO-8601 timestamps sort correctly as text
+        rows = self.connection().execute(
+            'SELECT brand_name, metric_name, metric_value, timestamp, quarter FROM dashboard_metrics '
+            'WHERE brand_name = ? AND metric_name = ? AND timestamp >= ? AND timestamp <= ? '
+            'ORDER BY timestamp DESC LIMIT ?',
+            (
+                brand_name, metric_name,
+                pd.Timestamp(start).isoformat() if start is not None else '',
+                pd.Timestamp(end).isoformat() if end is not None else '\uffff',
+                periods if periods is not None else -1
+            )
+        ).fetchall()
+        columns = ['brand_name', 'metric_name', 'metric_value', 'timestamp', 'quarter']
+        return [dict(zip(columns, row)) for row in reversed(rows)]
+
+
+def create_data_backend(repo_path, sync_mode='cdc'):
+    """Build the Data-tracker backend configured in the environment"""
+    backend_name = os.getenv('DATA_TRACKER_BACKEND', 'csv').lower()
+    if backend_name == 'sqlite':
+        return SQLiteDataBackend(os.getenv('DATA_TRACKER_DB_PATH', 'data/data_tracker.db'), repo_path)
+    return CSVRepositoryBackend(repo_path, sync_mode)
@@ -2,9 +2,21 @@
 import pandas as pd
 import json
 import os
+import threading
 from datetime import datetime
 import logging
 from dotenv import load_dotenv
+import http_transport
+import resilience
+from metric_store import MetricStore
+from metric_query import TrendIndex
+from backup_store import BackupStore
+from streaming_ingest import StreamingIngestor
+from data_backends import create_data_backend
+from notion_sync import (
+    MAX_CHILDREN_PER_REQUEST, NotionPageIndex, NotionWriteQueue, comparable_properties, content_hash, property_value
+)
+from rate_limiter import TokenBucket
 
 load_dotenv()
 
@@ -18,37 +30,52 @@ class DataTrackerConnector:
         self.backup_path = os.getenv('BACKUP_DATA_PATH', './data/backups')
         self.ensure_directories()
 
+        # CSV repository (only changed rows written unless SYNC_MODE=full) or embedded SQLite
+        self.sync_mode = os.getenv('SYNC_MODE', 'cdc').lower()
+        self.backend = create_data_backend(self.repo_path, self.sync_mode)
+
+        # Deduplicated snapshot backups
+        self.backup_store = BackupStore(self.backup_path)
+
+        # Partitioned time-series history of every synced snapshot
+        self.metric_store = None
+        self.trend_index = None
+        try:
+            self.metric_store = MetricStore(os.getenv('METRIC_STORE_PATH', './data/metric_store'))
+            self.trend_index = TrendIndex(self.metric_store)
+        except ImportError as e:
+            logger.warning(f"Metric store disabled: {str(e)}")
+
     def ensure_directories(self):
         """Create necessary directories"""
         os.makedirs(self.backup_path, exist_ok=True)
         os.makedirs('./data/processed', exist_ok=True)
 
-    def load_existing_data(self):
-        """Load data from Data-tracker repository"""
+    def load_existing_data(self, usecols=None, prefetch=None):
+        """Load data from Data-tracker repository as a handle that reads each table on first access"""
         try:
-            # Check for existing CSV files
-            data_files = {
-                'brands': f'{self.repo_path}/brands_data.csv',
-                'metrics': f'{self.repo_path}/social_metrics.csv', 
-                'campaigns': f'{self.repo_path}/campaign_data.csv',
-                'leads': f'{self.repo_path}/leads_data.csv'
-            }
+            return self.backend.load_tables(usecols=usecols, prefetch=prefetch)
 
-            loaded_data = {}
+        except Exception as e:
+            logger.error(f"Error loading Data-tracker data: {str(e)}")
+            return {}
 
-            for data_type, file_path in data_files.items():
-                if os.path.exists(file_path):
-                    loaded_data[data_type] = pd.read_csv(file_path)
-                    logger.info(f"Loaded {data_type} data from {file_path}")
-                else:
-                    logger.warning(f"Data file not found: {file_path}")
-                    loaded_data[data_type] = pd.DataFrame()
+    def ingest_large_tables(self, tables=('leads', 'campaigns'), force=False):
+        """Stream the large leads/campaign files into the metric store as per-brand daily metrics"""
+        results = {}
+        if not self.metric_store:
+            logger.warning("Metric store disabled, skipping Data-tracker ingestion")
+            return results
 
-            return loaded_data
+        try:
+            ingestor = StreamingIngestor(self.repo_path, self.metric_store)
+            for table_name in tables:
+                results[table_name] = ingestor.ingest(table_name, force=force)
+            return results
 
         except Exception as e:
-            logger.error(f"Error loading Data-tracker data: {str(e)}")
-            return {}
+            logger.error(f"Error ingesting Data-tracker tables: {str(e)}")
+            return results
 
     def sync_with_repository(self, dashboard_data):
         """Sync dashboard data with Data-tracker repository"""
@@ -58,13 +85,17 @@ class DataTrackerConnector:
             metrics_df = self.create_metrics_dataframe(dashboard_data)
 
             # Save to Data-tracker repository
-            brands_df.to_csv(f'{self.repo_path}/dashboard_brands.csv', index=False)
-            metrics_df.to_csv(f'{self.repo_path}/dashboard_metrics.csv', index=False)
+            changed = self.backend.write_snapshot(brands_df, metrics_df)
+
+            # Append the snapshot to the metric history
+            if self.metric_store:
+                self.metric_store.append(metrics_df)
 
-            # Create backup
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            brands_df.to_csv(f'{self.backup_path}/brands_backup_{timestamp}.csv', index=False)
-            metrics_df.to_csv(f'{self.backup_path}/metrics_backup_{timestamp}.csv', index=False)
+            # Create backup (only new content chunks are written)
+            if changed:
+                self.backup_store.backup_frames({'brands': brands_df, 'metrics': metrics_df})
+            else:
+                logger.info("No repository changes, backup skipped")
 
             logger.info("Data successfully synced with Data-tracker repository")
             return True
@@ -122,111 +153,259 @@ class DataTrackerConnector:
 
         return pd.DataFrame(metrics_list)
 
-    def get_historical_trends(self, brand_name, metric_name, periods=12):
+    def restore_backup(self, timestamp, target_dir=None):
+        """Restore the brands and metrics frames from a backup timestamp"""
+        try:
+            return self.backup_store.restore(timestamp, target_dir)
+        except Exception as e:
+            logger.error(f"Error restoring backup {timestamp}: {str(e)}")
+            return {}
+
+    def get_historical_trends(self, brand_name, metric_name, periods=12, granularity=None):
         """Get historical trends for a specific brand and metric"""
         try:
-            metrics_file = f'{self.repo_path}/dashboard_metrics.csv'
-            if os.path.exists(metrics_file):
-                df = pd.read_csv(metrics_file)
-                brand_metrics = df[
-                    (df['brand_name'] == brand_name) & 
-                    (df['metric_name'] == metric_name)
-                ].tail(periods)
-
-                return brand_metrics.to_dict('records')
-            else:
-                return []
+            if granularity and self.metric_store:
+                return self.get_rollup_trends(brand_name, metric_name, granularity, periods=periods)
+
+            if self.trend_index and not self.backend.indexed_history:
+                return self.trend_index.query_last(brand_name, metric_name, periods)
+
+            return self.backend.history(brand_name, metric_name, periods)
 
         except Exception as e:
             logger.error(f"Error getting historical trends: {str(e)}")
             return []
 
+    def get_rollup_trends(self, brand_name, metric_name, granularity, periods=None, start=None, end=None):
+        """Long-range trends read from the hourly/daily/weekly rollups instead of raw history"""
+        try:
+            rollup = self.metric_store.read_rollup(granularity, [brand_name], [metric_name], start, end)
+            if periods is not None:
+                rollup = rollup.tail(periods)
+
+            return [
+                {
+                    'brand_name': brand_name,
+                    'metric_name': metric_name,
+                    'metric_value': row['last'],
+                    'min': row['min'],
+                    'max': row['max'],
+                    'mean': row['mean'],
+                    'timestamp': row['bucket'].isoformat()
+                }
+                for row in rollup.to_dict('records')
+            ]
+
+        except Exception as e:
+            logger.error(f"Error getting {granularity} trends: {str(e)}")
+            return []
+
+    def get_historical_trends_batch(self, brand_metric_pairs, periods=12, start=None, end=None, granularity=None):
+        """Get historical trends for many (brand, metric) pairs in one call"""
+        try:
+            if granularity and self.metric_store:
+                return {
+                    (brand_name, metric_name): self.get_rollup_trends(
+                        brand_name, metric_name, granularity,
+                        periods=None if start is not None or end is not None else periods,
+                        start=start, end=end
+                    )
+                    for brand_name, metric_name in brand_metric_pairs
+                }
+
+            ranged = start is not None or end is not None
+            if self.trend_index and not self.backend.indexed_history:
+                if ranged:
+                    return self.trend_index.query_batch(brand_metric_pairs, start=start, end=end)
+                return self.trend_index.query_batch(brand_metric_pairs, periods=periods)
+
+            return {
+                (brand_name, metric_name): self.backend.history(
+                    brand_name, metric_name, None if ranged else periods, start=start, end=end
+                )
+                for brand_name, metric_name in brand_metric_pairs
+            }
+
+        except Exception as e:
+            logger.error(f"Error getting historical trends: {str(e)}")
+            return {}
+
+    def run_compaction(self):
+        """Roll up, expire and compact the metric history, then prune old backups"""
+        results = {}
+        try:
+            if self.metric_store:
+                results['rollups_built'] = self.metric_store.build_rollups()
+                results['partitions_expired'] = self.metric_store.apply_retention(
+                    int(os.getenv('METRIC_RAW_RETENTION_DAYS', '90'))
+                )
+                results['partitions_compacted'] = self.metric_store.compact_partitions()
+
+            results['backups_pruned'] = self.backup_store.prune(int(os.getenv('BACKUP_RETENTION_DAYS', '30')))
+            results['chunks_removed'], results['bytes_freed'] = self.backup_store.collect_garbage()
+            results['backup_bytes'] = self.backup_store.disk_usage()
+
+            logger.info(f"Compaction completed: {results}")
+            return results
+
+        except Exception as e:
+            logger.error(f"Error during compaction: {str(e)}")
+            return results
+
 class NotionDatabaseConnector:
     """Integration with Notion database for brand books"""
 
     def __init__(self):
         self.api_key = os.getenv('NOTION_API_KEY')
         self.database_id = os.getenv('NOTION_DATABASE_ID')
+        self.api_url = os.getenv('NOTION_API_URL', 'https://api.notion.com/v1').rstrip('/')
         self.headers = {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json',
             'Notion-Version': '2022-06-28'
         }
 
-    def create_brand_book_entry(self, brand_name, brand_data):
-        """Create or update brand book entry in Notion"""
-        try:
-            import requests
-
-            # Prepare Notion page properties
-            properties = {
-                "Brand Name": {
-                    "title": [{"text": {"content": brand_name}}]
-                },
-                "Category": {
-                    "select": {"name": brand_data['category']}
-                },
-                "Website Traffic": {
-                    "number": brand_data['metrics']['website_traffic']
-                },
-                "Social Followers": {
-                    "number": brand_data['metrics']['social_followers']
-                },
-                "Last Updated": {
-                    "date": {"start": datetime.now().isoformat()}
-                }
+        # Brand -> page ID, so daily syncs update pages instead of creating duplicates
+        self.page_index = NotionPageIndex(
+            os.getenv('NOTION_PAGE_INDEX_PATH', 'data/notion_page_index.json'), self.database_id
+        )
+
+        # Notion allows about 3 requests per second per integration
+        requests_per_second = float(os.getenv('NOTION_RATE_LIMIT_PER_SECOND', '3'))
+        self.rate_limiter = TokenBucket(
+            'notion', requests_per_second * 60, int(os.getenv('NOTION_RATE_LIMIT_BURST', '3'))
+        )
+        self._stats_lock = threading.Lock()
+        self.request_stats = {'requests': 0, 'throttled': 0, 'server_errors': 0}
+
+    def _count(self, counter):
+        with self._stats_lock:
+            self.request_stats[counter] += 1
+
+    def request(self, method, path, idempotent=None, **kwargs):
+        """Paced Notion API call, retried on 429/5xx using the server's Retry-After hint"""
+        # Creates and appends pass idempotent=False: they are only replayed when Notion turned them away
+        url = f"{self.api_url}/{path}"
+
+        def send():
+            self.rate_limiter.acquire()
+            response = http_transport.request(method, url, headers=self.headers, **kwargs)
+            self._count('requests')
+            # A 429 pauses every worker sharing the limiter, not just this one
+            self.rate_limiter.update_from_response(response)
+            if response.status_code == 429:
+                self._count('throttled')
+            elif response.status_code >= 500:
+                self._count('server_errors')
+            return response
+
+        return resilience.call_with_retry(method, url, send, idempotent=idempotent)
+
+    def append_child_blocks(self, block_id, children):
+        """Append blocks in chunks of at most 100, the per-request limit"""
+        for start in range(0, len(children), MAX_CHILDREN_PER_REQUEST):
+            chunk = children[start:start + MAX_CHILDREN_PER_REQUEST]
+            response = self.request(
+                'PATCH', f"blocks/{block_id}/children", idempotent=False, json={"children": chunk}
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"Notion block append failed: {response.status_code}")
+
+    def build_properties(self, brand_name, brand_data):
+        """Notion page properties for a brand book"""
+        return {
+            "Brand Name": {
+                "title": [{"text": {"content": brand_name}}]
+            },
+            "Category": {
+                "select": {"name": brand_data['category']}
+            },
+            "Website Traffic": {
+                "number": brand_data['metrics'].get('website_traffic')
+            },
+            "Social Followers": {
+                "number": brand_data['metrics'].get('social_followers')
+            },
+            "Last Updated": {
+                "date": {"start": datetime.now().isoformat()}
             }
+        }
 
-            # Create page content
-            children = [
-                {
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [{"text": {"content": "Strategic Insight"}}]
-                    }
-                },
-                {
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{"text": {"content": brand_data['insight']}}]
-                    }
-                },
-                {
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [{"text": {"content": "Market Trends"}}]
-                    }
+    def build_children(self, brand_data):
+        """Page content blocks: insight and market trends"""
+        children = [
+            {
+                "object": "block",
+                "type": "heading_2",
+                "heading_2": {
+                    "rich_text": [{"text": {"content": "Strategic Insight"}}]
                 }
-            ]
+            },
+            {
+                "object": "block",
+                "type": "paragraph",
+                "paragraph": {
+                    "rich_text": [{"text": {"content": brand_data['insight']}}]
+                }
+            },
+            {
+                "object": "block",
+                "type": "heading_2",
+                "heading_2": {
+                    "rich_text": [{"text": {"content": "Market Trends"}}]
+                }
+            }
+        ]
+
+        # Add trend bullets
+        for trend in brand_data.get('trends', []):
+            children.append({
+                "object": "block",
+                "type": "bulleted_list_item",
+                "bulleted_list_item": {
+                    "rich_text": [{"text": {"content": trend}}]
+                }
+            })
 
-            # Add trend bullets
-            for trend in brand_data['trends']:
-                children.append({
-                    "object": "block",
-                    "type": "bulleted_list_item",
-                    "bulleted_list_item": {
-                        "rich_text": [{"text": {"content": trend}}]
-                    }
-                })
+        return children
+
+    def create_brand_book_entry(self, brand_name, brand_data):
+        """Create a new brand book page in Notion"""
+        try:
+            properties = self.build_properties(brand_name, brand_data)
+            children = self.build_children(brand_data)
 
             payload = {
                 "parent": {"database_id": self.database_id},
                 "properties": properties,
-                "children": children
+                "children": children[:MAX_CHILDREN_PER_REQUEST]
             }
 
-            response = requests.post(
-                "https://api.notion.com/v1/pages",
-                headers=self.headers,
-                json=payload
-            )
+            response = self.request('POST', 'pages', idempotent=False, json=payload)
 
             if response.status_code == 200:
                 logger.info(f"Brand book entry created for {brand_name}")
-                return response.json()
+                page = response.json()
+                overflow = children[MAX_CHILDREN_PER_REQUEST:]
+
+                # Indexed and saved before anything else can fail, so the next sync updates this page
+                # instead of creating another; the content hash waits until all blocks are in
+                self.page_index.put(
+                    brand_name, page['id'], comparable_properties(properties),
+                    None if overflow else content_hash(children)
+                )
+                self.page_index.save()
+
+                # Content beyond the first 100 blocks goes in follow-up appends
+                if overflow:
+                    try:
+                        self.append_child_blocks(page['id'], overflow)
+                    except Exception as e:
+                        # No stored hash, so the next upsert compares the live content and rewrites it
+                        logger.error(f"Error appending Notion content for {brand_name}: {str(e)}")
+                        return page
+                    self.page_index.put(brand_name, page['id'], content=content_hash(children))
+                return page
             else:
                 logger.error(f"Notion API error: {response.status_code}")
                 return None
@@ -235,6 +414,126 @@ class NotionDatabaseConnector:
             logger.error(f"Error creating Notion entry: {str(e)}")
             return None
 
+    def query_database_pages(self):
+        """Yield every page of the brand book database, following query pagination"""
+        payload = {"page_size": 100}
+        while True:
+            response = self.request('POST', f"databases/{self.database_id}/query", idempotent=True, json=payload)
+            if response.status_code != 200:
+                raise RuntimeError(f"Notion database query failed: {response.status_code}")
+            data = response.json()
+            yield from data.get('results', [])
+            if not data.get('has_more'):
+                return
+            payload = {"page_size": 100, "start_cursor": data['next_cursor']}
+
+    def build_page_index(self):
+        """Map brand names to existing page IDs with one paginated database query"""
+        try:
+            pages = 0
+            for page in self.query_database_pages():
+                properties = page.get('properties', {})
+                brand_name = property_value(properties.get('Brand Name', {}))
+                if brand_name:
+                    self.page_index.put(brand_name, page['id'], comparable_properties(properties))
+                    pages += 1
+            self.page_index.mark_built()
+            self.page_index.save()
+            logger.info(f"Notion page index built with {pages} pages")
+            return pages
+
+        except Exception as e:
+            logger.error(f"Error building Notion page index: {str(e)}")
+            return None
+
+    def list_child_blocks(self, page_id):
+        """Every child block of a page, following pagination"""
+        blocks = []
+        path = f"blocks/{page_id}/children?page_size=100"
+        while path:
+            response = self.request('GET', path)
+            if response.status_code != 200:
+                raise RuntimeError(f"Notion block listing failed: {response.status_code}")
+            data = response.json()
+            blocks.extend(data.get('results', []))
+            path = f"blocks/{page_id}/children?page_size=100&start_cursor={data['next_cursor']}" if data.get('has_more') else None
+        return blocks
+
+    def replace_child_blocks(self, page_id, existing_blocks, children):
+        """Delete a page's blocks and append the new content"""
+        for block in existing_blocks:
+            response = self.request('DELETE', f"blocks/{block['id']}")
+            if response.status_code not in (200, 404):
+                raise RuntimeError(f"Notion block delete failed: {response.status_code}")
+        self.append_child_blocks(page_id, children)
+
+    def upsert_brand_book_entry(self, brand_name, brand_data, save=True):
+        """Update a brand's existing page with only what changed, creating it if missing"""
+        try:
+            # Without a complete index an upsert could create a duplicate page
+            if not self.page_index.built and self.build_page_index() is None:
+                return {'brand': brand_name, 'action': 'failed'}
+
+            entry = self.page_index.get(brand_name)
+            if entry is None:
+                page = self.create_brand_book_entry(brand_name, brand_data)
+                if save:
+                    self.page_index.save()
+                return {'brand': brand_name, 'action': 'created' if page else 'failed'}
+
+            page_id = entry['page_id']
+            properties = self.build_properties(brand_name, brand_data)
+            children = self.build_children(brand_data)
+            actions = []
+
+            desired = comparable_properties(properties)
+            known = entry.get('properties') or {}
+            changed = {name: properties[name] for name, value in desired.items() if known.get(name) != value}
+            if changed:
+                changed['Last Updated'] = properties['Last Updated']
+                response = self.request('PATCH', f"pages/{page_id}", idempotent=True, json={"properties": changed})
+                if response.status_code == 404:
+                    # Page deleted in Notion; recreate it on the next sync
+                    self.page_index.remove(brand_name)
+                    if save:
+                        self.page_index.save()
+                    return {'brand': brand_name, 'action': 'missing'}
+                if response.status_code != 200:
+                    raise RuntimeError(f"Notion page update failed: {response.status_code}")
+                self.page_index.put(brand_name, page_id, properties=desired)
+                actions.append('properties')
+
+            desired_content = content_hash(children)
+            if entry.get('content_hash') != desired_content:
+                existing_blocks = self.list_child_blocks(page_id)
+                # Pages indexed from a database query have no stored hash; compare the live content once
+                if content_hash(existing_blocks) != desired_content:
+                    self.replace_child_blocks(page_id, existing_blocks, children)
+                    actions.append('content')
+                self.page_index.put(brand_name, page_id, content=desired_content)
+
+            if save:
+                self.page_index.save()
+            return {'brand': brand_name, 'action': '+'.join(actions) if actions else 'unchanged'}
+
+        except Exception as e:
+            logger.error(f"Error upserting Notion entry for {brand_name}: {str(e)}")
+            return {'brand': brand_name, 'action': 'failed'}
+
+    def sync_brand_books(self, entries, concurrency=None):
+        """Upsert many brand books concurrently, paced at the Notion rate limit"""
+        try:
+            results = NotionWriteQueue(self, concurrency).run(entries)
+            summary = {}
+            for result in filter(None, results):
+                summary[result['action']] = summary.get(result['action'], 0) + 1
+            logger.info(f"Notion sync: {summary}, requests: {self.request_stats}")
+            return results
+
+        except Exception as e:
+            logger.error(f"Error syncing Notion brand books: {str(e)}")
+            return []
+
 def initialize_data_connections():
     """Initialize all data connections"""
     connections = {
@@ -0,0 +1,202 @@
+import logging
+import os
+import threading
+import zlib
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import atomic_io
+
+try:
+    import pyarrow
+    import pyarrow.feather as feather
+except ImportError:
+    pyarrow = None
+    feather = None
+
+logger = logging.getLogger(__name__)
+
+# Data-tracker CSV files by table name
+TABLE_FILES = {
+    'brands': 'brands_data.csv',
+    'metrics': 'social_metrics.csv',
+    'campaigns': 'campaign_data.csv',
+    'leads': 'leads_data.csv'
+}
+
+# Expected column types. Only columns present in a file's header are pinned; text types are
+# applied while parsing, numeric ones only after inference shows the column really is numeric
+TABLE_DTYPES = {
+    'brands': {
+        'brand_name': 'category',
+        'category': 'category',
+        'total_followers': 'float64',
+        'website_traffic': 'float64'
+    },
+    'metrics': {
+        'brand_name': 'category',
+        'metric_name': 'category',
+        'metric_value': 'float64'
+    },
+    'campaigns': {
+        'brand_name': 'category',
+        'campaign_name': 'string',
+        'channel': 'category',
+        'spend': 'float64',
+        'impressions': 'float64',
+        'clicks': 'float64',
+        'conversions': 'float64'
+    },
+    'leads': {
+        'brand_name': 'category',
+        'lead_id': 'string',
+        'source': 'category',
+        'status': 'category'
+    }
+}
+
+TABLE_DATE_COLUMNS = {
+    'metrics': ['timestamp'],
+    'campaigns': ['start_date', 'end_date'],
+    'leads': ['created_at']
+}
+
+
+def read_csv_header(file_path):
+    return list(pd.read_csv(file_path, nrows=0).columns)
+
+
+def parse_dtypes(table_name, columns):
+    """Dtypes safe to force while parsing: text and category types of columns in the file"""
+    return {
+        column: dtype for column, dtype in TABLE_DTYPES.get(table_name, {}).items()
+        if column in columns and dtype in ('category', 'string')
+    }
+
+
+def apply_numeric_dtypes(df, table_name):
+    """Cast expected numeric columns that parsed as numbers; others keep their inferred type"""
+    for column, dtype in TABLE_DTYPES.get(table_name, {}).items():
+        if column not in df.columns or dtype in ('category', 'string'):
+            continue
+        if pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = df[column].astype(dtype)
+        else:
+            logger.warning(f"{table_name}.{column} is not numeric, keeping inferred {df[column].dtype}")
+    return df
+
+
+def read_csv_typed(file_path, table_name, usecols=None):
+    """Read a CSV with the table's known dtypes, using the pyarrow engine when available"""
+    header = read_csv_header(file_path)
+    columns = [column for column in header if usecols is None or column in usecols]
+    date_columns = [column for column in TABLE_DATE_COLUMNS.get(table_name, []) if column in columns]
+
+    engine = 'pyarrow' if pyarrow is not None else 'c'
+    df = pd.read_csv(file_path, usecols=columns, dtype=parse_dtypes(table_name, columns), engine=engine)
+    for column in date_columns:
+        df[column] = pd.to_datetime(df[column], errors='coerce')
+    return apply_numeric_dtypes(df, table_name)
+
+
+class LazyDataset(Mapping):
+    """Dict-like handle over the Data-tracker tables that reads each table on first access"""
+
+    def __init__(self, repo_path, cache_dir='./data/processed', usecols=None, max_workers=4):
+        self.repo_path = repo_path
+        self.cache_dir = cache_dir
+        self.usecols = usecols or {}
+        self.max_workers = max_workers
+        self._tables = {}
+        self._locks = {table_name: threading.Lock() for table_name in TABLE_FILES}
+
+    def __getitem__(self, table_name):
+        if table_name not in TABLE_FILES:
+            raise KeyError(table_name)
+        if table_name in self._tables:
+            return self._tables[table_name]
+
+        # Concurrent first accesses to the same table read it once
+        with self._locks[table_name]:
+            if table_name not in self._tables:
+                self._tables[table_name] = self._load(table_name)
+        return self._tables[table_name]
+
+    def __iter__(self):
+        return iter(TABLE_FILES)
+
+    def __len__(self):
+        return len(TABLE_FILES)
+
+    def loaded(self):
+        """Names of the tables read so far"""
+        return list(self._tables)
+
+    def prefetch(self, table_names=None):
+        """Load several tables in parallel threads"""
+        table_names = list(table_names or TABLE_FILES)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(table_names)) or 1) as executor:
+            list(executor.map(self.__getitem__, table_names))
+        return self
+
+    def source_path(self, table_name):
+        return os.path.join(self.repo_path, TABLE_FILES[table_name])
+
+    def sidecar_prefix(self, table_name):
+        """Cache file prefix for a table and its column selection"""
+        if table_name not in self.usecols:
+            return f"{table_name}.all."
+        columns_key = zlib.crc32(','.join(sorted(self.usecols[table_name])).encode())
+        return f"{table_name}.{columns_key:08x}."
+
+    def sidecar_path(self, table_name, stat):
+        """Binary cache file keyed by the source's mtime and size"""
+        return os.path.join(
+            self.cache_dir,
+            f"{self.sidecar_prefix(table_name)}{stat.st_mtime_ns}.{stat.st_size}.feather"
+        )
+
+    def _load(self, table_name):
+        file_path = self.source_path(table_name)
+        if not os.path.exists(file_path):
+            logger.warning(f"Data file not found: {file_path}")
+            return pd.DataFrame()
+
+        stat = os.stat(file_path)
+        sidecar = self.sidecar_path(table_name, stat) if feather is not None else None
+        if sidecar and os.path.exists(sidecar):
+            try:
+                df = feather.read_feather(sidecar)
+                logger.info(f"Loaded {table_name} data from cache {sidecar}")
+                return df
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable cache {sidecar}: {str(e)}")
+
+        # Errors surface here on first access rather than in load_existing_data, so they are handled
+        # the same way: logged, with an empty table in place of the unreadable one
+        try:
+            df = read_csv_typed(file_path, table_name, self.usecols.get(table_name))
+        except Exception as e:
+            logger.error(f"Error loading Data-tracker data from {file_path}: {str(e)}")
+            return pd.DataFrame()
+        logger.info(f"Loaded {table_name} data from {file_path}")
+
+        if sidecar:
+            self._write_sidecar(table_name, df, sidecar)
+        return df
+
+    def _write_sidecar(self, table_name, df, sidecar):
+        try:
+            with atomic_io.atomic_write(sidecar, 'wb', lock=False) as f:
+                feather.write_feather(df.reset_index(drop=True), f)
+
+            # Sidecars for older versions of the source are no longer reachable
+            prefix = self.sidecar_prefix(table_name)
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if name.startswith(prefix) and name.endswith('.feather') and path != sidecar:
+                    os.remove(path)
+        except Exception as e:
+            logger.warning(f"Could not cache {table_name} data: {str(e)}")
@@ -0,0 +1,302 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from itertools import takewhile
+
+from dotenv import load_dotenv
+
+import atomic_io
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# How far back recent posts count towards engagement rate
+LOOKBACK_DAYS = int(os.getenv('ENGAGEMENT_LOOKBACK_DAYS', '30'))
+
+# Items requested per page from each platform
+PAGE_SIZE = int(os.getenv('ENGAGEMENT_PAGE_SIZE', '100'))
+LINKEDIN_PAGE_SIZE = 50
+
+# Posts this recent are re-read on every refresh, since their like and comment counts are still growing
+RESCAN_DAYS = int(os.getenv('ENGAGEMENT_RESCAN_DAYS', '7'))
+
+# Persisted high-water marks and per-post counts per account
+STATE_PATH = os.getenv('ENGAGEMENT_STATE_PATH', 'data/engagement_state.json')
+
+
+class PaginationError(Exception):
+    """Raised when a post stream fails before reaching the end of the requested window"""
+
+
+class EngagementAccumulator:
+    """Latest interaction counts of each post in the lookback window, keyed by post id"""
+
+    def __init__(self):
+        self.latest_post = None
+        self.posts = {}
+
+    def add(self, post):
+        """Record a post, replacing the counts of one seen on an earlier refresh"""
+        self.posts[post['id']] = [post['timestamp'].isoformat(), post['likes'], post['comments'], post['shares']]
+        if self.latest_post is None or post['timestamp'] > self.latest_post:
+            self.latest_post = post['timestamp']
+
+    def prune(self, since):
+        """Drop posts that fell out of the lookback window"""
+        for post_id in [post_id for post_id, post in self.posts.items() if datetime.fromisoformat(post[0]) < since]:
+            del self.posts[post_id]
+
+    @property
+    def interactions(self):
+        return sum(likes + comments + shares for _, likes, comments, shares in self.posts.values())
+
+    def engagement_rate(self, followers):
+        """Average interactions per post as a percentage of followers"""
+        if not self.posts or not followers:
+            return None
+        return round(self.interactions / len(self.posts) / followers * 100, 2)
+
+    def summary(self, followers):
+        return {
+            'engagement_rate': self.engagement_rate(followers),
+            'posts_analyzed': len(self.posts),
+            'interactions': self.interactions
+        }
+
+    def to_state(self):
+        return {
+            'latest_post': self.latest_post.isoformat() if self.latest_post else None,
+            'posts': self.posts
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        accumulator = cls()
+        # State saved as daily totals cannot have its counts replaced, so it is rebuilt by a full scan
+        if 'posts' not in state:
+            return accumulator
+        if state.get('latest_post'):
+            accumulator.latest_post = datetime.fromisoformat(state['latest_post'])
+        accumulator.posts = {post_id: list(post) for post_id, post in state['posts'].items()}
+        return accumulator
+
+
+class EngagementStateStore:
+    """Per-account high-water marks and daily aggregates persisted between refreshes"""
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(path, 'r') as f:
+                self._states = json.load(f)
+        except FileNotFoundError:
+            self._states = {}
+        except ValueError:
+            logger.warning(f"Engagement state file {path} unreadable, starting fresh")
+            self._states = {}
+
+    def get(self, platform, account_id):
+        with self._lock:
+            return self._states.get(f"{platform}:{account_id}")
+
+    def put(self, platform, account_id, state):
+        with self._lock:
+            self._states[f"{platform}:{account_id}"] = state
+            self._dirty = True
+
+    def save(self):
+        """Write the state file if anything changed since the last save"""
+        with self._lock:
+            if not self._dirty:
+                return
+            atomic_io.write_json(self.path, self._states)
+            self._dirty = False
+
+
+def lookback_start(days=None):
+    """Oldest post timestamp inside the lookback window"""
+    return datetime.now(timezone.utc) - timedelta(days=days or LOOKBACK_DAYS)
+
+
+def scan_start(latest_post, since, rescan_days=None):
+    """Oldest post to fetch: the rescan window, or the last post seen if that is older"""
+    if latest_post is None:
+        return since
+    rescan_from = datetime.now(timezone.utc) - timedelta(days=rescan_days or RESCAN_DAYS)
+    return max(since, min(rescan_from, latest_post))
+
+
+def parse_graph_timestamp(value):
+    """Parse Graph API timestamps such as 2024-01-31T10:00:00+0000"""
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+
+
+def iter_pages(connector, platform, url, next_page_url, page_items=None, **kwargs):
+    """Yield the items of each page, requesting the next page only when needed"""
+    while url:
+        response = connector._platform_get(platform, url, **kwargs)
+        if response.status_code != 200:
+            raise PaginationError(f"{platform} pagination error: {response.status_code}")
+
+        page = response.json()
+        if page_items:
+            yield from page_items(page)
+        else:
+            yield from page.get('data', page.get('elements', []))
+        url = next_page_url(page)
+
+
+def iter_instagram_media(connector, account_id, since=None):
+    """Stream an Instagram account's media, newest first"""
+    url = (
+        f"{connector.instagram_api_url}/{account_id}/media"
+        f"?fields=id,timestamp,like_count,comments_count&limit={PAGE_SIZE}"
+        f"&access_token={connector.instagram_token}"
+    )
+    for media in iter_pages(connector, 'instagram', url, lambda page: page.get('paging', {}).get('next')):
+        yield {
+            'id': media['id'],
+            'timestamp': parse_graph_timestamp(media['timestamp']),
+            'likes': media.get('like_count', 0),
+            'comments': media.get('comments_count', 0),
+            'shares': 0
+        }
+
+
+def iter_facebook_posts(connector, page_id, since=None):
+    """Stream a Facebook page's posts, newest first"""
+    url = (
+        f"{connector.facebook_api_url}/{page_id}/posts"
+        f"?fields=id,created_time,shares,reactions.summary(total_count).limit(0),"
+        f"comments.summary(total_count).limit(0)&limit={PAGE_SIZE}"
+        f"&access_token={connector.facebook_token}"
+    )
+    # The Graph API can filter /posts server-side by creation time
+    if since:
+        url += f"&since={int(since.timestamp())}"
+    for post in iter_pages(connector, 'facebook', url, lambda page: page.get('paging', {}).get('next')):
+        yield {
+            'id': post['id'],
+            'timestamp': parse_graph_timestamp(post['created_time']),
+            'likes': post.get('reactions', {}).get('summary', {}).get('total_count', 0),
+            'comments': post.get('comments', {}).get('summary', {}).get('total_count', 0),
+            'shares': post.get('shares', {}).get('count', 0)
+        }
+
+
+def iter_linkedin_shares(connector, company_id, since=None):
+    """Stream a LinkedIn organization's shares with their statistics, newest first"""
+    headers = {'Authorization': f'Bearer {connector.linkedin_token}'}
+    owner = f"urn:li:organization:{company_id}"
+    base_url = f"{connector.linkedin_api_url}/shares?q=owners&owners={owner}&sortBy=CREATED&count={LINKEDIN_PAGE_SIZE}"
+
+    def next_page_url(page):
+        paging = page.get('paging', {})
+        start = paging.get('start', 0) + paging.get('count', LINKEDIN_PAGE_SIZE)
+        if not page.get('elements') or start >= paging.get('total', start):
+            return None
+        return f"{base_url}&start={start}"
+
+    def statistics_for(shares):
+        share_params = '&'.join(f"shares[{i}]={share['id']}" for i, share in enumerate(shares))
+        stats_url = (
+            f"{connector.linkedin_api_url}/organizationalEntityShareStatistics"
+            f"?q=organizationalEntity&organizationalEntity={owner}&{share_params}"
+        )
+        response = connector._platform_get('linkedin', stats_url, headers=headers)
+        if response.status_code != 200:
+            raise PaginationError(f"LinkedIn share statistics error: {response.status_code}")
+        return {
+            element['share']: element.get('totalShareStatistics', {})
+            for element in response.json().get('elements', [])
+        }
+
+    # Statistics are fetched one page of shares at a time
+    page_shares = []
+    for share in iter_pages(connector, 'linkedin', f"{base_url}&start=0", next_page_url, headers=headers):
+        page_shares.append(share)
+        if len(page_shares) < LINKEDIN_PAGE_SIZE:
+            continue
+        yield from _linkedin_posts(page_shares, statistics_for(page_shares))
+        page_shares = []
+
+    if page_shares:
+        yield from _linkedin_posts(page_shares, statistics_for(page_shares))
+
+
+def iter_tiktok_videos(connector, business_id, since=None):
+    """Stream a TikTok business account's videos, newest first"""
+    headers = {'Access-Token': connector.tiktok_token}
+    base_url = (
+        f"{connector.tiktok_api_url}/business/video/list/?business_id={business_id}"
+        f'&fields=["item_id","create_time","likes","comments","shares"]&max_count=20'
+    )
+
+    def page_items(page):
+        if page.get('code', 0) != 0:
+            raise PaginationError(f"TikTok video list error: {page.get('code')} {page.get('message')}")
+        return page.get('data', {}).get('videos', [])
+
+    def next_page_url(page):
+        data = page.get('data', {})
+        if page.get('code', 0) != 0 or not data.get('has_more'):
+            return None
+        return f"{base_url}&cursor={data.get('cursor')}"
+
+    for video in iter_pages(connector, 'tiktok', base_url, next_page_url, page_items, headers=headers):
+        yield {
+            'id': video['item_id'],
+            'timestamp': datetime.fromtimestamp(video['create_time'], tz=timezone.utc),
+            'likes': video.get('likes', 0),
+            'comments': video.get('comments', 0),
+            'shares': video.get('shares', 0)
+        }
+
+
+def _linkedin_posts(shares, statistics):
+    for share in shares:
+        share_stats = statistics.get(share['id'], {})
+        yield {
+            'id': share['id'],
+            'timestamp': datetime.fromtimestamp(share['created']['time'] / 1000, tz=timezone.utc),
+            'likes': share_stats.get('likeCount', 0),
+            'comments': share_stats.get('commentCount', 0),
+            'shares': share_stats.get('shareCount', 0)
+        }
+
+
+POST_STREAMS = {
+    'linkedin': iter_linkedin_shares,
+    'instagram': iter_instagram_media,
+    'facebook': iter_facebook_posts,
+    'tiktok': iter_tiktok_videos
+}
+
+
+def iter_recent_posts(connector, platform, account_id, since=None):
+    """Stream posts at or after `since`, stopping pagination once the window is covered"""
+    since = since or lookback_start()
+    posts = POST_STREAMS[platform](connector, account_id, since=since)
+    return takewhile(lambda post: post['timestamp'] >= since, posts)
+
+
+def compute_engagement(connector, platform, account_id, followers, state_store=None):
+    """Refresh the account's per-post counts from its recent posts and return the engagement summary"""
+    since = lookback_start()
+    state = state_store.get(platform, account_id) if state_store else None
+    accumulator = EngagementAccumulator.from_state(state) if state else EngagementAccumulator()
+    accumulator.prune(since)
+
+    # Posts since the last one seen, plus the rescan window; ids dedupe the overlap
+    for post in iter_recent_posts(connector, platform, account_id, scan_start(accumulator.latest_post, since)):
+        accumulator.add(post)
+
+    # A PaginationError leaves the stored state untouched, so the next refresh fetches the gap again
+    if state_store:
+        state_store.put(platform, account_id, accumulator.to_state())
+    return accumulator.summary(followers)
@@ -0,0 +1,85 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def timed_call(call):
+    """Run call() and return (result, latency_ms, error)"""
+    started = time.perf_counter()
+    try:
+        result, error = call(), None
+    except Exception as e:
+        result, error = None, str(e)
+    return result, round((time.perf_counter() - started) * 1000, 1), error
+
+
+class FanOutDispatcher:
+    """Send to several destinations concurrently, each with its own deadline from when its call starts"""
+
+    def __init__(self, max_workers=None, default_timeout=None):
+        self.max_workers = max_workers or int(os.getenv('FANOUT_MAX_WORKERS', '8'))
+        self.default_timeout = default_timeout or float(os.getenv('FANOUT_TIMEOUT_SECONDS', '15'))
+
+    def timeout_for(self, destination, timeouts):
+        if isinstance(timeouts, dict):
+            return timeouts.get(destination, self.default_timeout)
+        return timeouts or self.default_timeout
+
+    def dispatch(self, calls, timeouts=None):
+        """Run {destination: callable} concurrently; returns {destination: {success, result, latency_ms, error}}"""
+        # A call succeeds when it returns a truthy value before its deadline
+        results = {}
+        queued = deque(calls.items())
+        running = {}
+        completed = queue.Queue()
+
+        def run(destination, call):
+            completed.put((destination, timed_call(call)))
+
+        while queued or running:
+            # At most max_workers calls are live; each deadline starts when its call does
+            while queued and len(running) < self.max_workers:
+                destination, call = queued.popleft()
+                running[destination] = time.monotonic() + self.timeout_for(destination, timeouts)
+                # Daemon threads: a call that hangs past its deadline never blocks later calls or exit
+                threading.Thread(target=run, args=(destination, call), name=f"fanout-{destination}", daemon=True).start()
+
+            try:
+                next_deadline = min(running.values())
+                destination, (result, latency_ms, error) = completed.get(timeout=max(0.0, next_deadline - time.monotonic()))
+                # Late results of calls already reported as timed out are ignored
+                if running.pop(destination, None) is not None:
+                    results[destination] = {
+                        'success': error is None and bool(result),
+                        'result': result,
+                        'latency_ms': latency_ms,
+                        'error': error
+                    }
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            for destination, deadline in list(running.items()):
+                if now >= deadline:
+                    # The call keeps running until its transport timeout; only the caller stops waiting,
+                    # and its slot goes to the next queued call
+                    del running[destination]
+                    timeout = self.timeout_for(destination, timeouts)
+                    logger.warning(f"{destination} did not respond within {timeout}s")
+                    results[destination] = {
+                        'success': False,
+                        'result': None,
+                        'latency_ms': round(timeout * 1000, 1),
+                        'error': 'timeout'
+                    }
+
+        return {destination: results[destination] for destination in calls}
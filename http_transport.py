@@ -0,0 +1,82 @@
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connection pool and timeout settings shared by every connector
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '32'))
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class PooledSession(requests.Session):
+    """Keep-alive session that applies the default connect/read timeouts"""
+
+    def __init__(self, pool_size=POOL_SIZE, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+        super().__init__()
+        self.default_timeout = timeout
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        self.headers['Connection'] = 'keep-alive'
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.default_timeout)
+        return super().request(method, url, **kwargs)
+
+
+def get_session(url):
+    """Return the pooled session for the host of the given URL"""
+    parts = urlsplit(url)
+    host_key = f"{parts.scheme}://{parts.netloc}"
+
+    session = _sessions.get(host_key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host_key)
+            if session is None:
+                session = PooledSession()
+                _sessions[host_key] = session
+    return session
+
+
+def request(method, url, **kwargs):
+    """Send a request through the pooled session for its host"""
+    return get_session(url).request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    """Pooled equivalent of requests.get"""
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    """Pooled equivalent of requests.post"""
+    return request('POST', url, **kwargs)
+
+
+def patch(url, **kwargs):
+    """Pooled equivalent of requests.patch"""
+    return request('PATCH', url, **kwargs)
+
+
+def delete(url, **kwargs):
+    """Pooled equivalent of requests.delete"""
+    return request('DELETE', url, **kwargs)
+
+
+def close_all_sessions():
+    """Close every pooled session and its connections"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
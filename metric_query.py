@@ -0,0 +1,114 @@
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class TrendIndex:
+    """In-memory (brand, metric, timestamp) index over the metric history"""
+
+    def __init__(self, store=None):
+        self.store = store
+        self.built_version = None
+        self._lock = threading.Lock()
+
+        # (timestamps, values, slices) swapped as one unit so readers never see a half-built index
+        self._snapshot = (np.empty(0, dtype='datetime64[us]'), np.empty(0, dtype='float64'), {})
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build an index directly from a metrics frame"""
+        index = cls()
+        index._build(df)
+        return index
+
+    def _build(self, df):
+        """Sort rows by (brand, metric, timestamp) and record each pair's slice"""
+        brand_codes = pd.Categorical(df['brand_name'])
+        metric_codes = pd.Categorical(df['metric_name'])
+        timestamps = df['timestamp'].to_numpy(dtype='datetime64[us]')
+
+        order = np.lexsort((timestamps, metric_codes.codes, brand_codes.codes))
+        brand_sorted = brand_codes.codes[order]
+        metric_sorted = metric_codes.codes[order]
+
+        # Boundaries where the (brand, metric) pair changes
+        change = np.flatnonzero((np.diff(brand_sorted) != 0) | (np.diff(metric_sorted) != 0)) + 1
+        starts = np.concatenate(([0], change)) if len(order) else np.empty(0, dtype=int)
+        ends = np.concatenate((change, [len(order)])) if len(order) else np.empty(0, dtype=int)
+
+        slices = {}
+        for start, end in zip(starts, ends):
+            key = (brand_codes.categories[brand_sorted[start]], metric_codes.categories[metric_sorted[start]])
+            slices[key] = (int(start), int(end))
+
+        self._snapshot = (timestamps[order], df['metric_value'].to_numpy(dtype='float64')[order], slices)
+
+    def refresh(self):
+        """Rebuild from the store if it changed since the last build"""
+        if self.store is None:
+            return
+        version = self.store.version()
+        if version == self.built_version:
+            return
+        with self._lock:
+            if version != self.built_version:
+                self._build(self.store.read())
+                self.built_version = version
+                logger.info(f"Trend index rebuilt with {len(self._snapshot[1])} rows and {len(self._snapshot[2])} series")
+
+    def _records(self, snapshot, brand_name, metric_name, start, end):
+        timestamps, values, _ = snapshot
+        return [
+            {
+                'brand_name': brand_name,
+                'metric_name': metric_name,
+                'metric_value': value,
+                'timestamp': timestamp
+            }
+            for timestamp, value in zip(
+                np.datetime_as_string(timestamps[start:end], unit='us').tolist(),
+                values[start:end].tolist()
+            )
+        ]
+
+    def query_range(self, brand_name, metric_name, start=None, end=None):
+        """Rows for one series with start <= timestamp <= end"""
+        self.refresh()
+        snapshot = self._snapshot
+        timestamps, _, slices = snapshot
+        if (brand_name, metric_name) not in slices:
+            return []
+
+        first, last = slices[(brand_name, metric_name)]
+        series = timestamps[first:last]
+        lo, hi = first, last
+        if start is not None:
+            lo = first + int(np.searchsorted(series, np.datetime64(pd.Timestamp(start), 'us'), side='left'))
+        if end is not None:
+            hi = first + int(np.searchsorted(series, np.datetime64(pd.Timestamp(end), 'us'), side='right'))
+        return self._records(snapshot, brand_name, metric_name, lo, max(lo, hi))
+
+    def query_last(self, brand_name, metric_name, periods=12):
+        """The most recent `periods` rows for one series"""
+        self.refresh()
+        snapshot = self._snapshot
+        slices = snapshot[2]
+        if (brand_name, metric_name) not in slices:
+            return []
+        lo, hi = slices[(brand_name, metric_name)]
+        return self._records(snapshot, brand_name, metric_name, max(lo, hi - periods), hi)
+
+    def query_batch(self, pairs, periods=None, start=None, end=None):
+        """Answer many (brand, metric) queries in one call"""
+        self.refresh()
+        results = {}
+        for brand_name, metric_name in pairs:
+            if periods is not None:
+                results[(brand_name, metric_name)] = self.query_last(brand_name, metric_name, periods)
+            else:
+                results[(brand_name, metric_name)] = self.query_range(brand_name, metric_name, start, end)
+        return results
@@ -0,0 +1,432 @@
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+import atomic_io
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pc = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# Rollup granularities and how timestamps are bucketed for each
+ROLLUP_FREQUENCIES = {
+    'hourly': lambda ts: ts.dt.floor('H'),
+    'daily': lambda ts: ts.dt.floor('D'),
+    'weekly': lambda ts: ts.dt.to_period('W').dt.start_time
+}
+
+
+# Files holding the complete contribution of one source, rewritten whole on every ingest
+SOURCE_PREFIX = 'source-'
+
+# Compacted part files carry the names of the files they replace in their Parquet metadata
+COMPACTED_SUFFIX = '-compacted.parquet'
+SUPERSEDES_KEY = b'metric_store.supersedes'
+# Digest of the rows a file holds, combined with XOR so a compacted file keeps the digest of its inputs
+CONTENTS_KEY = b'metric_store.contents'
+# Rollups record the contents digest of the raw partition they were built from
+ROLLUP_SOURCE_KEY = b'metric_store.rollup_source'
+
+
+def name_digest(text):
+    return int(hashlib.sha256(text.encode('utf-8')).hexdigest(), 16)
+
+
+def arrow_schema():
+    """Typed columns of every stored snapshot row"""
+    return pa.schema([
+        ('brand_name', pa.dictionary(pa.int32(), pa.string())),
+        ('metric_name', pa.dictionary(pa.int32(), pa.string())),
+        ('metric_value', pa.float64()),
+        ('timestamp', pa.timestamp('us'))
+    ])
+
+
+class MetricStore:
+    """Append-only Parquet metric history partitioned by brand and month"""
+
+    # Touched on every write so readers can cheaply detect changes
+    VERSION_FILE = '_version'
+
+    def __init__(self, root_path='./data/metric_store'):
+        if pa is None:
+            raise ImportError("pyarrow is required for the metric store")
+        self.root_path = root_path
+        os.makedirs(root_path, exist_ok=True)
+
+    def version(self):
+        """Change marker for the store contents (0 if never written)"""
+        try:
+            return os.stat(os.path.join(self.root_path, self.VERSION_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def mark_changed(self):
+        version_path = os.path.join(self.root_path, self.VERSION_FILE)
+        with open(version_path, 'a'):
+            pass
+        os.utime(version_path, None)
+
+    @staticmethod
+    def normalize(metrics_df):
+        """Cast a metrics frame to the store's typed columns"""
+        df = pd.DataFrame({
+            'brand_name': metrics_df['brand_name'].astype(str),
+            'metric_name': metrics_df['metric_name'].astype(str),
+            'metric_value': pd.to_numeric(metrics_df['metric_value'], errors='coerce').astype('float64'),
+            'timestamp': pd.to_datetime(metrics_df['timestamp']).astype('datetime64[us]')
+        })
+        df['brand_name'] = df['brand_name'].astype('category')
+        df['metric_name'] = df['metric_name'].astype('category')
+        return df.dropna(subset=['metric_value'])
+
+    def partition_path(self, brand_name, month):
+        return os.path.join(self.root_path, f"brand={quote(brand_name, safe='')}", f"month={month}")
+
+    def append(self, metrics_df):
+        """Append a snapshot as new part files; returns the number of partitions touched"""
+        if metrics_df is None or metrics_df.empty:
+            return 0
+
+        df = self.normalize(metrics_df)
+        months = df['timestamp'].dt.strftime('%Y-%m')
+        part_name = f"part-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+
+        touched = 0
+        for (brand_name, month), partition_df in df.groupby([df['brand_name'].astype(str), months], observed=True):
+            partition_dir = self.partition_path(brand_name, month)
+            table = pa.Table.from_pandas(partition_df.reset_index(drop=True), schema=arrow_schema(), preserve_index=False)
+            with atomic_io.atomic_write(os.path.join(partition_dir, part_name), 'wb', lock=False) as f:
+                pq.write_table(table, f)
+            touched += 1
+
+        self.mark_changed()
+        logger.info(f"Appended {len(df)} metric rows to {touched} partitions")
+        return touched
+
+    def replace_source(self, source_name, metrics_df, start=None):
+        """Make metrics_df the whole history a source contributes from `start` on, replacing earlier writes"""
+        file_name = f"{SOURCE_PREFIX}{quote(source_name, safe='')}.parquet"
+        written = set()
+
+        if metrics_df is not None and not metrics_df.empty:
+            df = self.normalize(metrics_df)
+            if start is not None:
+                df = df[df['timestamp'] >= pd.Timestamp(start)]
+            months = df['timestamp'].dt.strftime('%Y-%m')
+            for (brand_name, month), partition_df in df.groupby([df['brand_name'].astype(str), months], observed=True):
+                partition_dir = self.partition_path(brand_name, month)
+                table = pa.Table.from_pandas(partition_df.reset_index(drop=True), schema=arrow_schema(), preserve_index=False)
+                with atomic_io.atomic_write(os.path.join(partition_dir, file_name), 'wb', lock=False) as f:
+                    pq.write_table(table, f)
+                written.add(partition_dir)
+
+        # Brand-months the source no longer covers lose its old file
+        cleared = set()
+        for partition_dir in self.partitions(start=start):
+            source_file = os.path.join(partition_dir, file_name)
+            if partition_dir not in written and os.path.exists(source_file):
+                os.remove(source_file)
+                cleared.add(partition_dir)
+        removed = len(cleared)
+
+        # Rollups already built over these partitions would otherwise keep the replaced rows
+        self.build_rollups(partition_dirs=sorted(written | cleared), existing_only=True)
+        self.mark_changed()
+        logger.info(f"Replaced {source_name} metrics in {len(written)} partitions, cleared {removed}")
+        return len(written)
+
+    def brands(self, root_path=None):
+        """Brand names with stored history"""
+        root_path = root_path or self.root_path
+        if not os.path.isdir(root_path):
+            return []
+        return sorted(
+            unquote(entry[len('brand='):])
+            for entry in os.listdir(root_path)
+            if entry.startswith('brand=')
+        )
+
+    def partitions(self, brands=None, start=None, end=None, root_path=None):
+        """Partition directories matching the brand filter and month range"""
+        root_path = root_path or self.root_path
+        start_month = pd.Timestamp(start).strftime('%Y-%m') if start is not None else None
+        end_month = pd.Timestamp(end).strftime('%Y-%m') if end is not None else None
+
+        selected = []
+        for brand_name in brands or self.brands(root_path):
+            brand_dir = os.path.join(root_path, f"brand={quote(brand_name, safe='')}")
+            if not os.path.isdir(brand_dir):
+                continue
+            for entry in sorted(os.listdir(brand_dir)):
+                month = entry[len('month='):]
+                if start_month and month < start_month:
+                    continue
+                if end_month and month > end_month:
+                    continue
+                selected.append(os.path.join(brand_dir, entry))
+        return selected
+
+    def superseded_files(self, partition_dir, names):
+        """Names of part files that a compacted file in the partition already contains"""
+        superseded = set()
+        for name in names:
+            if name.endswith(COMPACTED_SUFFIX):
+                try:
+                    metadata = pq.read_schema(os.path.join(partition_dir, name)).metadata or {}
+                except FileNotFoundError:
+                    continue
+                superseded.update(filter(None, metadata.get(SUPERSEDES_KEY, b'').decode().split('\n')))
+        return superseded
+
+    def part_files(self, partition_dir):
+        """Live part files of a partition, leaving out ones a compacted file already contains"""
+        try:
+            names = sorted(name for name in os.listdir(partition_dir) if name.endswith('.parquet'))
+        except FileNotFoundError:
+            return []
+
+        superseded = self.superseded_files(partition_dir, names)
+        return [os.path.join(partition_dir, name) for name in names if name not in superseded]
+
+    def read_partition_tables(self, partition_dir):
+        """Arrow tables of a partition's live part files, relisting if compaction removed one mid-read"""
+        for attempt in range(3):
+            try:
+                return [pq.read_table(part_file, schema=arrow_schema()) for part_file in self.part_files(partition_dir)]
+            except FileNotFoundError:
+                # A compaction swapped the files under us; the next listing sees its result
+                if attempt == 2:
+                    raise
+
+    def read(self, brands=None, metrics=None, start=None, end=None):
+        """Read history touching only the partitions that can match the filters"""
+        tables = []
+        for partition_dir in self.partitions(brands, start, end):
+            for table in self.read_partition_tables(partition_dir):
+                if metrics:
+                    mask = pc.is_in(table['metric_name'].cast(pa.string()), value_set=pa.array(list(metrics)))
+                    table = table.filter(mask)
+                tables.append(table)
+
+        if not tables:
+            return pd.DataFrame({
+                'brand_name': pd.Categorical([]),
+                'metric_name': pd.Categorical([]),
+                'metric_value': pd.Series([], dtype='float64'),
+                'timestamp': pd.Series([], dtype='datetime64[us]')
+            })
+
+        df = pa.concat_tables(tables).to_pandas()
+        if start is not None:
+            df = df[df['timestamp'] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df['timestamp'] <= pd.Timestamp(end)]
+        return df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+    def read_partition(self, partition_dir):
+        """Read every part file of one partition"""
+        tables = self.read_partition_tables(partition_dir)
+        if not tables:
+            return None
+        return pa.concat_tables(tables).to_pandas()
+
+    def _write_file(self, df, path, schema=None, metadata=None):
+        """Write a frame as Parquet atomically"""
+        table = pa.Table.from_pandas(df.reset_index(drop=True), schema=schema, preserve_index=False)
+        if metadata:
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+        with atomic_io.atomic_write(path, 'wb', lock=False) as f:
+            pq.write_table(table, f)
+
+    def contents_digest(self, part_file):
+        """Digest of the rows in one part file; appended files never change, so their name identifies them"""
+        name = os.path.basename(part_file)
+        if name.startswith(SOURCE_PREFIX):
+            # Source files are rewritten under the same name
+            with open(part_file, 'rb') as f:
+                return name_digest(name) ^ int(hashlib.sha256(f.read()).hexdigest(), 16)
+        if name.endswith(COMPACTED_SUFFIX):
+            contents = (pq.read_schema(part_file).metadata or {}).get(CONTENTS_KEY)
+            if contents:
+                return int(contents, 16)
+        return name_digest(name)
+
+    def partition_digest(self, partition_dir):
+        """(live part files, digest of their combined contents), relisting if compaction removed one"""
+        for attempt in range(3):
+            try:
+                part_files = self.part_files(partition_dir)
+                digest = 0
+                for part_file in part_files:
+                    digest ^= self.contents_digest(part_file)
+                return part_files, format(digest, 'x')
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def rollup_root(self, frequency):
+        return os.path.join(self.root_path, 'rollups', frequency)
+
+    def build_rollups(self, frequencies=None, partition_dirs=None, existing_only=False):
+        """Downsample raw partitions into min/max/mean/last rollups, skipping ones already current"""
+        # existing_only refreshes rollups that were built before without building new ones
+        built = 0
+        removed = 0
+        for partition_dir in self.partitions() if partition_dirs is None else partition_dirs:
+            relative_dir = os.path.relpath(partition_dir, self.root_path)
+            rollup_paths = {
+                frequency: os.path.join(self.rollup_root(frequency), relative_dir, 'rollup.parquet')
+                for frequency in frequencies or ROLLUP_FREQUENCIES
+            }
+
+            # Expired partitions are deleted whole and keep their rollups; an emptied one has no data left
+            part_files, digest = self.partition_digest(partition_dir)
+            if not part_files:
+                for rollup_path in rollup_paths.values():
+                    if os.path.exists(rollup_path):
+                        os.remove(rollup_path)
+                        removed += 1
+                continue
+
+            raw = None
+            for frequency, rollup_path in rollup_paths.items():
+                if os.path.exists(rollup_path):
+                    metadata = pq.read_schema(rollup_path).metadata or {}
+                    if metadata.get(ROLLUP_SOURCE_KEY) == digest.encode():
+                        continue
+                elif existing_only:
+                    continue
+
+                if raw is None:
+                    raw = self.read_partition(partition_dir).sort_values('timestamp', kind='stable')
+                bucketed = raw.assign(bucket=ROLLUP_FREQUENCIES[frequency](raw['timestamp']))
+                rollup = bucketed.groupby(['brand_name', 'metric_name', 'bucket'], observed=True).agg(
+                    min=('metric_value', 'min'),
+                    max=('metric_value', 'max'),
+                    mean=('metric_value', 'mean'),
+                    last=('metric_value', 'last'),
+                    count=('metric_value', 'size'),
+                    last_timestamp=('timestamp', 'max')
+                ).reset_index()
+                self._write_file(rollup, rollup_path, metadata={ROLLUP_SOURCE_KEY: digest})
+                built += 1
+
+        logger.info(f"Built {built} rollup partitions, removed {removed} without raw data")
+        return built
+
+    def read_rollup(self, frequency, brands=None, metrics=None, start=None, end=None):
+        """Read pre-aggregated rollups, merging buckets split across month partitions"""
+        frames = []
+        for partition_dir in self.partitions(brands, start, end, root_path=self.rollup_root(frequency)):
+            rollup_path = os.path.join(partition_dir, 'rollup.parquet')
+            if os.path.exists(rollup_path):
+                frames.append(pq.read_table(rollup_path).to_pandas())
+        if not frames:
+            return pd.DataFrame(columns=['brand_name', 'metric_name', 'bucket', 'min', 'max', 'mean', 'last', 'count'])
+
+        df = pd.concat(frames, ignore_index=True)
+        df['brand_name'] = df['brand_name'].astype(str)
+        df['metric_name'] = df['metric_name'].astype(str)
+        if metrics:
+            df = df[df['metric_name'].isin(metrics)]
+        if start is not None:
+            df = df[df['bucket'] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df['bucket'] <= pd.Timestamp(end)]
+
+        # Weekly buckets can straddle two month partitions
+        df = df.sort_values('last_timestamp').assign(weighted=lambda d: d['mean'] * d['count'])
+        merged = df.groupby(['brand_name', 'metric_name', 'bucket'], observed=True).agg(
+            min=('min', 'min'), max=('max', 'max'), weighted=('weighted', 'sum'),
+            last=('last', 'last'), count=('count', 'sum')
+        ).reset_index()
+        merged['mean'] = merged['weighted'] / merged['count']
+        return merged.drop(columns='weighted').sort_values('bucket').reset_index(drop=True)
+
+    @staticmethod
+    def retention_start(retention_days):
+        """First day of the oldest month kept by apply_retention"""
+        return (pd.Timestamp.now() - pd.Timedelta(days=retention_days)).to_period('M').start_time
+
+    def apply_retention(self, retention_days):
+        """Delete raw month partitions entirely older than the retention window, after rolling them up"""
+        cutoff_month = self.retention_start(retention_days).strftime('%Y-%m')
+        expired = [
+            partition_dir for partition_dir in self.partitions()
+            if os.path.basename(partition_dir)[len('month='):] < cutoff_month
+        ]
+        if not expired:
+            return 0
+
+        # Rollups must cover the raw data before it goes
+        self.build_rollups()
+        for partition_dir in expired:
+            shutil.rmtree(partition_dir)
+
+        self.mark_changed()
+        logger.info(f"Removed {len(expired)} raw partitions older than {cutoff_month}")
+        return len(expired)
+
+    def compact_partitions(self, min_files=2):
+        """Merge each partition's small part files into a single file"""
+        compacted = 0
+        for partition_dir in self.partitions():
+            # Files left behind by a compaction interrupted before its cleanup; only names a compacted
+            # file lists are removed, so a part file appended since the listing is never touched
+            names = [name for name in os.listdir(partition_dir) if name.endswith('.parquet')]
+            for name in self.superseded_files(partition_dir, names):
+                try:
+                    os.remove(os.path.join(partition_dir, name))
+                except FileNotFoundError:
+                    pass
+
+            live_files = self.part_files(partition_dir)
+
+            # Source files are replaced whole on the next ingest, so they are never merged
+            part_files = [path for path in live_files if not os.path.basename(path).startswith(SOURCE_PREFIX)]
+            if len(part_files) < min_files:
+                continue
+
+            tables = [pq.read_table(part_file, schema=arrow_schema()) for part_file in part_files]
+            merged = pa.concat_tables(tables).to_pandas().sort_values('timestamp', kind='stable')
+
+            # The compacted file names the files it replaces, so readers ignore them from the
+            # moment it appears; renaming it into place publishes the swap atomically
+            # It also keeps their combined contents digest, so rollups stay current across the swap
+            contents = 0
+            for part_file in part_files:
+                contents ^= self.contents_digest(part_file)
+            schema = arrow_schema().with_metadata({
+                SUPERSEDES_KEY: '\n'.join(os.path.basename(part_file) for part_file in part_files),
+                CONTENTS_KEY: format(contents, 'x')
+            })
+            compacted_name = f"part-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}{COMPACTED_SUFFIX}"
+            compacted_path = os.path.join(partition_dir, compacted_name)
+            self._write_file(merged, compacted_path, schema=schema)
+
+            # Only the files that were merged are removed; concurrent appends survive
+            for part_file in part_files:
+                try:
+                    os.remove(part_file)
+                except FileNotFoundError:
+                    pass
+            compacted += 1
+
+        if compacted:
+            self.mark_changed()
+        logger.info(f"Compacted {compacted} partitions")
+        return compacted
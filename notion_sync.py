@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import atomic_io
+
+logger = logging.getLogger(__name__)
+
+# Notion accepts at most 100 child blocks per create or append request
+MAX_CHILDREN_PER_REQUEST = 100
+
+# Set whenever other properties change; on its own it is not a reason to update a page
+TIMESTAMP_PROPERTY = 'Last Updated'
+
+
+def property_value(prop):
+    """Comparable value of a Notion property in either request or response form"""
+    if 'title' in prop or 'rich_text' in prop:
+        parts = prop.get('title', prop.get('rich_text')) or []
+        return ''.join(part.get('plain_text', part.get('text', {}).get('content', '')) for part in parts)
+    if 'select' in prop:
+        return (prop['select'] or {}).get('name')
+    if 'number' in prop:
+        return prop['number']
+    if 'date' in prop:
+        return (prop['date'] or {}).get('start')
+    return None
+
+
+def comparable_properties(properties):
+    return {name: property_value(prop) for name, prop in properties.items() if name != TIMESTAMP_PROPERTY}
+
+
+def block_text(block):
+    """(type, text) of a block, the part of page content that the sync owns"""
+    block_type = block.get('type')
+    rich_text = (block.get(block_type) or {}).get('rich_text') or []
+    return block_type, ''.join(part.get('plain_text', part.get('text', {}).get('content', '')) for part in rich_text)
+
+
+def content_hash(blocks):
+    return hashlib.sha256(json.dumps([block_text(block) for block in blocks]).encode()).hexdigest()
+
+
+class NotionPageIndex:
+    """Persisted brand -> Notion page mapping with the last synced properties and content hash"""
+
+    def __init__(self, path='data/notion_page_index.json', database_id=None):
+        self.path = path
+        self.database_id = database_id
+        self._lock = threading.Lock()
+        # Saves are serialized so an older snapshot never overwrites a newer one
+        self._save_lock = threading.Lock()
+        self.built = False
+        self._entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    state = json.load(f)
+                # Page IDs of another database would be patched instead of creating pages in this one
+                if state.get('database_id') != database_id:
+                    logger.info(f"Notion page index {path} belongs to another database, it will be rebuilt")
+                else:
+                    self._entries = state.get('pages', {})
+                    self.built = state.get('built', False)
+            except ValueError:
+                logger.warning(f"Notion page index {path} unreadable, it will be rebuilt")
+
+    def get(self, brand_name):
+        with self._lock:
+            return self._entries.get(brand_name)
+
+    def put(self, brand_name, page_id, properties=None, content=None):
+        """Record a page; None leaves the stored properties or content hash untouched"""
+        with self._lock:
+            entry = self._entries.setdefault(brand_name, {'page_id': page_id, 'properties': None, 'content_hash': None})
+            entry['page_id'] = page_id
+            if properties is not None:
+                entry['properties'] = properties
+            if content is not None:
+                entry['content_hash'] = content
+
+    def remove(self, brand_name):
+        with self._lock:
+            self._entries.pop(brand_name, None)
+
+    def mark_built(self):
+        with self._lock:
+            self.built = True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                state = {'database_id': self.database_id, 'built': self.built, 'pages': {name: dict(entry) for name, entry in self._entries.items()}}
+            atomic_io.write_json(self.path, state)
+
+
+class NotionWriteQueue:
+    """Async queue that pipelines brand book upserts through the connector's shared rate limiter"""
+
+    def __init__(self, connector, concurrency=None):
+        self.connector = connector
+        # Enough workers in flight to keep the limiter busy while requests wait on latency
+        self.concurrency = concurrency or int(os.getenv('NOTION_MAX_CONCURRENCY', '8'))
+
+    async def _worker(self, queue, executor, results):
+        loop = asyncio.get_running_loop()
+        while True:
+            position, brand_name, brand_data = await queue.get()
+            try:
+                results[position] = await loop.run_in_executor(
+                    executor, self.connector.upsert_brand_book_entry, brand_name, brand_data, False
+                )
+            finally:
+                queue.task_done()
+
+    async def run_async(self, entries):
+        """Upsert (brand_name, brand_data) pairs; returns results in input order"""
+        entries = list(entries)
+        results = [None] * len(entries)
+        if not entries:
+            return results
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            loop = asyncio.get_running_loop()
+            # Built once up front so workers do not race to query the database; creates save the
+            # index as they happen, and everything else is saved once at the end
+            if not self.connector.page_index.built:
+                await loop.run_in_executor(executor, self.connector.build_page_index)
+
+            queue = asyncio.Queue()
+            for position, (brand_name, brand_data) in enumerate(entries):
+                queue.put_nowait((position, brand_name, brand_data))
+
+            workers = [
+                asyncio.create_task(self._worker(queue, executor, results))
+                for _ in range(min(self.concurrency, len(entries)))
+            ]
+            try:
+                await queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+        self.connector.page_index.save()
+        return results
+
+    def run(self, entries):
+        return asyncio.run(self.run_async(entries))
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Default quotas in calls per minute, overridable with <PLATFORM>_RATE_LIMIT_PER_MINUTE
+DEFAULT_RATE_LIMITS = {
+    'linkedin': 100,
+    'instagram': 200,
+    'facebook': 200,
+    'tiktok': 600
+}
+
+# Usage percentage (from X-App-Usage style headers) above which calls are slowed down
+USAGE_THROTTLE_THRESHOLD = float(os.getenv('RATE_LIMIT_USAGE_THRESHOLD', '80'))
+
+# Pause applied after a 429 that carries no Retry-After hint
+DEFAULT_BACKOFF_SECONDS = float(os.getenv('RATE_LIMIT_DEFAULT_BACKOFF', '10'))
+
+USAGE_HEADERS = ('X-App-Usage', 'X-Ad-Account-Usage', 'X-Business-Use-Case-Usage')
+
+
+class TokenBucket:
+    """Thread-safe token bucket that paces calls at a fixed rate with bursts"""
+
+    def __init__(self, name, rate_per_minute, burst=None):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst or max(1, int(rate_per_minute // 10)))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.usage_percent = 0.0
+        self._lock = threading.Lock()
+
+        # Wait accounting
+        self.calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _effective_rate(self):
+        """Current refill rate, reduced as reported usage nears the quota"""
+        if self.usage_percent <= USAGE_THROTTLE_THRESHOLD:
+            return self.rate
+        headroom = max(0.0, 100.0 - self.usage_percent) / (100.0 - USAGE_THROTTLE_THRESHOLD)
+        return self.rate * max(0.1, headroom)
+
+    def _reserve(self, tokens):
+        """Take tokens (possibly in advance) and return how long the caller must wait"""
+        with self._lock:
+            now = time.monotonic()
+            rate = self._effective_rate()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * rate)
+            self.updated_at = now
+            self.tokens -= tokens
+
+            wait = 0.0
+            if self.tokens < 0:
+                wait = -self.tokens / rate
+            wait = max(wait, self.paused_until - now)
+            return wait
+
+    def acquire(self, tokens=1):
+        """Block until the given number of calls is allowed and return the seconds waited"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+        with self._lock:
+            self.calls += tokens
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        return wait
+
+    def pause(self, seconds):
+        """Stop handing out tokens for the given number of seconds"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        logger.warning(f"{self.name} rate limited, pausing calls for {seconds:.1f}s")
+
+    def update_from_response(self, response):
+        """Adjust pacing from throttling status codes and usage headers"""
+        headers = response.headers
+
+        usage = parse_usage_headers(headers)
+        if usage is not None:
+            with self._lock:
+                self.usage_percent = usage
+            if usage >= 100:
+                self.pause(parse_regain_access_seconds(headers) or DEFAULT_BACKOFF_SECONDS)
+
+        if response.status_code in (429, 503):
+            retry_after = parse_retry_after(headers.get('Retry-After'))
+            if retry_after is not None:
+                self.pause(retry_after)
+            elif response.status_code == 429:
+                self.pause(DEFAULT_BACKOFF_SECONDS)
+
+    def stats(self):
+        """Return call and wait statistics"""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'total_wait_seconds': round(self.total_wait, 3),
+                'max_wait_seconds': round(self.max_wait, 3),
+                'avg_wait_seconds': round(self.total_wait / self.calls, 3) if self.calls else 0.0,
+                'usage_percent': self.usage_percent,
+                'rate_per_minute': round(self._effective_rate() * 60, 2)
+            }
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _usage_values(payload):
+    """Yield every usage percentage found in a usage header payload"""
+    if isinstance(payload, dict):
+        for key, value in payload.items():
+            if key in ('call_count', 'total_cputime', 'total_time', 'acc_id_util_pct') and isinstance(value, (int, float)):
+                yield float(value)
+            else:
+                yield from _usage_values(value)
+    elif isinstance(payload, list):
+        for item in payload:
+            yield from _usage_values(item)
+
+
+def parse_usage_headers(headers):
+    """Return the highest usage percentage reported by Graph API usage headers"""
+    values = []
+    for header in USAGE_HEADERS:
+        raw = headers.get(header)
+        if not raw:
+            continue
+        try:
+            values.extend(_usage_values(json.loads(raw)))
+        except ValueError:
+            logger.debug(f"Unparseable {header} header: {raw}")
+    return max(values) if values else None
+
+
+def parse_regain_access_seconds(headers):
+    """Return the estimated seconds until access is restored, if reported"""
+    raw = headers.get('X-Business-Use-Case-Usage')
+    if not raw:
+        return None
+    try:
+        payload = json.loads(raw)
+    except ValueError:
+        return None
+
+    minutes = [
+        entry.get('estimated_time_to_regain_access', 0)
+        for entries in payload.values() if isinstance(entries, list)
+        for entry in entries if isinstance(entry, dict)
+    ]
+    return max(minutes) * 60 if minutes and max(minutes) else None
+
+
+def create_platform_limiters(platforms=None):
+    """Build one token bucket per platform from environment configuration"""
+    limiters = {}
+    for platform in platforms or DEFAULT_RATE_LIMITS:
+        rate = float(os.getenv(f'{platform.upper()}_RATE_LIMIT_PER_MINUTE', DEFAULT_RATE_LIMITS.get(platform, 60)))
+        burst = os.getenv(f'{platform.upper()}_RATE_LIMIT_BURST')
+        limiters[platform] = TokenBucket(platform, rate, int(burst) if burst else None)
+    return limiters
@@ -0,0 +1,199 @@
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+
+import http_transport
+from rate_limiter import parse_retry_after
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying for idempotent calls
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# A 500, 502 or 504 may arrive after the request was applied, so non-idempotent calls are replayed
+# only on a 429, or a 503 with Retry-After: both mean the request was turned away unprocessed
+UNPROCESSED_STATUS = {429}
+# Default when the caller does not say; PATCH is not here because Notion's PATCH blocks/{id}/children appends
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised when a host's circuit breaker is rejecting calls"""
+
+
+class RetryPolicy:
+    """Bounded retries with decorrelated-jitter exponential backoff"""
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None, max_elapsed=None):
+        self.max_attempts = max_attempts or int(os.getenv('HTTP_MAX_RETRIES', '3')) + 1
+        self.base_delay = base_delay or float(os.getenv('HTTP_RETRY_BASE_DELAY', '0.5'))
+        self.max_delay = max_delay or float(os.getenv('HTTP_RETRY_MAX_DELAY', '10'))
+        self.max_elapsed = max_elapsed or float(os.getenv('HTTP_RETRY_MAX_ELAPSED', '60'))
+        self.retry_after_jitter = float(os.getenv('HTTP_RETRY_AFTER_JITTER', '0.1'))
+
+    def next_delay(self, previous_delay):
+        """Decorrelated jitter: uniform between the base delay and 3x the previous delay"""
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous_delay * 3)))
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker that fails fast while a host is down"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+        self.reset_timeout = reset_timeout or float(os.getenv('CIRCUIT_RESET_SECONDS', '60'))
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.total_failures = 0
+        self.total_rejections = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """Return True if a call may go out now"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.total_rejections += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self.trial_in_flight = False
+
+            if self.state == self.HALF_OPEN:
+                # Only one trial call probes a recovering host
+                if self.trial_in_flight:
+                    self.total_rejections += 1
+                    return False
+                self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit for {self.name} opened after {self.consecutive_failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        """Return the breaker state for monitoring"""
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'total_failures': self.total_failures,
+                'total_rejections': self.total_rejections
+            }
+
+
+def get_breaker(url):
+    """Return the circuit breaker for the host of the given URL"""
+    host = urlsplit(url).netloc
+    breaker = _breakers.get(host)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(host, CircuitBreaker(host))
+    return breaker
+
+
+def breaker_states():
+    """Return the state of every circuit breaker keyed by host"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {host: breaker.snapshot() for host, breaker in breakers.items()}
+
+
+def call_with_retry(method, url, send, policy=None, idempotent=None):
+    """Run send() with retries and the host's circuit breaker, returning the final response"""
+    # idempotent overrides the method default, e.g. True for a PATCH that sets properties
+    policy = policy or RetryPolicy()
+    breaker = get_breaker(url)
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+    started = time.monotonic()
+    delay = policy.base_delay
+
+    for attempt in range(1, policy.max_attempts + 1):
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"Circuit open for {breaker.name}")
+
+        response = None
+        retry_after = None
+        try:
+            response = send()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            last_error = e
+            breaker.record_failure()
+            # A read timeout may mean the request was processed; only replay idempotent calls
+            replay_safe = idempotent or not isinstance(e, requests.ReadTimeout)
+            if not replay_safe or attempt == policy.max_attempts:
+                raise
+            logger.warning(f"{method} {breaker.name} failed ({type(e).__name__}), attempt {attempt}/{policy.max_attempts}")
+        except Exception:
+            # Any other failure (e.g. ChunkedEncodingError) must still settle a half-open trial
+            breaker.record_failure()
+            raise
+        else:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if idempotent:
+                retryable = response.status_code in RETRYABLE_STATUS
+            else:
+                retryable = response.status_code in UNPROCESSED_STATUS or (
+                    response.status_code == 503 and retry_after is not None
+                )
+            if not retryable or attempt == policy.max_attempts:
+                return response
+            logger.warning(f"{method} {breaker.name} returned {response.status_code}, attempt {attempt}/{policy.max_attempts}")
+
+        delay = policy.next_delay(delay)
+        if retry_after is not None:
+            # Follow the server's hint, plus a little jitter so callers told to wait the same
+            # time (or not at all) do not retry in lockstep
+            sleep_for = min(retry_after, policy.max_delay) + random.uniform(0, policy.retry_after_jitter)
+        else:
+            sleep_for = delay
+
+        # Keep the total time spent on one call bounded
+        if time.monotonic() - started + sleep_for > policy.max_elapsed:
+            if response is None:
+                raise last_error
+            return response
+        time.sleep(sleep_for)
+
+
+def resilient_request(method, url, policy=None, idempotent=None, **kwargs):
+    """Send a pooled request with retries and circuit breaking"""
+    return call_with_retry(method, url, lambda: http_transport.request(method, url, **kwargs), policy, idempotent)
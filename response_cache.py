@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Default freshness per platform in seconds, overridable with <PLATFORM>_CACHE_TTL_SECONDS
+DEFAULT_TTLS = {
+    'linkedin': 3600,
+    'instagram': 3600,
+    'facebook': 3600,
+    'tiktok': 3600
+}
+
+# Query parameters and headers that identify the caller rather than the resource
+CREDENTIAL_PARAMS = {'access_token', 'appsecret_proof'}
+CREDENTIAL_HEADERS = {'authorization', 'access-token'}
+
+
+class CachedResponse:
+    """Minimal response object served from the cache"""
+
+    def __init__(self, entry, status_code=200):
+        self.status_code = status_code
+        self.headers = entry.get('headers', {})
+        self.text = entry['body']
+        self.from_cache = True
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class MemoryCacheBackend:
+    """In-memory LRU cache backend"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """On-disk cache backend that survives process restarts"""
+
+    def __init__(self, path='data/response_cache.db'):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, entry TEXT NOT NULL, stored_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT entry FROM responses WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, entry):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, entry, stored_at) VALUES (?, ?, ?)',
+                (key, json.dumps(entry), entry['stored_at'])
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+
+
+class ResponseCache:
+    """TTL response cache with ETag / Last-Modified revalidation"""
+
+    def __init__(self, backend=None, ttls=None):
+        self.backend = backend or MemoryCacheBackend()
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._lock = threading.Lock()
+        self.counters = {}
+
+    def _count(self, platform, counter, amount=1):
+        with self._lock:
+            platform_counters = self.counters.setdefault(platform, {
+                'hits': 0, 'misses': 0, 'revalidations': 0, 'stores': 0, 'bytes_saved': 0
+            })
+            platform_counters[counter] += amount
+
+    @staticmethod
+    def make_key(method, url, params=None, headers=None):
+        """Key a request by method, endpoint, parameters and a digest of its credentials"""
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query) + sorted((params or {}).items())
+        query = sorted((name, str(value)) for name, value in query)
+
+        # Credentials are hashed separately so different tokens never share an entry,
+        # while the canonical URL stays free of secrets
+        credentials = [(name, value) for name, value in query if name in CREDENTIAL_PARAMS]
+        credentials += sorted(
+            (name.lower(), str(value)) for name, value in (headers or {}).items() if name.lower() in CREDENTIAL_HEADERS
+        )
+        credential_digest = hashlib.sha256(repr(credentials).encode()).hexdigest()
+
+        query = [(name, value) for name, value in query if name not in CREDENTIAL_PARAMS]
+        canonical = urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+        return hashlib.sha256(f"{method.upper()} {canonical} {credential_digest}".encode()).hexdigest()
+
+    def lookup(self, platform, key):
+        """Return (entry, is_fresh) for a cached response, or (None, False)"""
+        entry = self.backend.get(key)
+        if entry is None:
+            self._count(platform, 'misses')
+            return None, False
+
+        ttl = self.ttls.get(platform, 0)
+        if time.time() - entry['stored_at'] < ttl:
+            self._count(platform, 'hits')
+            self._count(platform, 'bytes_saved', len(entry['body']))
+            return entry, True
+
+        # Stale entries are only useful if the server can revalidate them
+        if entry.get('etag') or entry.get('last_modified'):
+            return entry, False
+
+        self._count(platform, 'misses')
+        return None, False
+
+    def conditional_headers(self, entry):
+        """Build If-None-Match / If-Modified-Since headers for a stale entry"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, platform, key, response):
+        """Cache a successful response body with its validators"""
+        entry = {
+            'body': response.text,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'stored_at': time.time()
+        }
+        self.backend.set(key, entry)
+        self._count(platform, 'stores')
+        return entry
+
+    def revalidated(self, platform, key, entry):
+        """Extend a stale entry's lifetime after a 304 Not Modified"""
+        entry = {**entry, 'stored_at': time.time()}
+        self.backend.set(key, entry)
+        self._count(platform, 'revalidations')
+        self._count(platform, 'bytes_saved', len(entry['body']))
+        return entry
+
+    def stats(self):
+        """Return hit/miss/revalidation counters per platform"""
+        with self._lock:
+            return {platform: dict(counters) for platform, counters in self.counters.items()}
+
+
+def create_response_cache(platforms=None):
+    """Build the response cache configured in the environment"""
+    backend_name = os.getenv('RESPONSE_CACHE_BACKEND', 'memory').lower()
+    if backend_name == 'sqlite':
+        backend = SQLiteCacheBackend(os.getenv('RESPONSE_CACHE_PATH', 'data/response_cache.db'))
+    else:
+        backend = MemoryCacheBackend(int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '10000')))
+
+    ttls = {
+        platform: float(os.getenv(f'{platform.upper()}_CACHE_TTL_SECONDS', DEFAULT_TTLS.get(platform, 0)))
+        for platform in platforms or DEFAULT_TTLS
+    }
+    return ResponseCache(backend, ttls)
@@ -0,0 +1,43 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_EXTENSIONS = ('.msgpack', '.mpk')
+
+
+def snapshot_format(filename):
+    """Format of a metrics snapshot, chosen by file extension"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in MSGPACK_EXTENSIONS:
+        if msgpack is None:
+            raise ImportError("msgpack is required for .msgpack snapshots")
+        return 'msgpack'
+    return 'json'
+
+
+def dumps(data, filename):
+    """Serialize a snapshot in the format its filename implies"""
+    if snapshot_format(filename) == 'msgpack':
+        return msgpack.packb(data, use_bin_type=True, default=str)
+    # Compact separators: the snapshot is read by code, not people
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(data, separators=(',', ':'), default=str).encode()
+
+
+def loads(payload, filename):
+    """Parse a snapshot in the format its filename implies"""
+    if snapshot_format(filename) == 'msgpack':
+        return msgpack.unpackb(payload, raw=False)
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
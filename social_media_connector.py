@@ -1,10 +1,20 @@
 
-import requests
 import json
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 import logging
+import atomic_io
+import http_transport
+import resilience
+import snapshot_format
+from rate_limiter import create_platform_limiters
+from response_cache import CachedResponse, create_response_cache
+import engagement
+from request_coalescing import SingleFlight
 
 load_dotenv()
 
@@ -12,34 +22,193 @@ load_dotenv()
 logging.basicConfig(level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO')))
 logger = logging.getLogger(__name__)
 
+# Brand config key and fetcher method for each supported platform
+PLATFORM_FETCHERS = {
+    'linkedin': ('linkedin_id', 'get_linkedin_metrics'),
+    'instagram': ('instagram_id', 'get_instagram_metrics'),
+    'facebook': ('facebook_id', 'get_facebook_metrics'),
+    'tiktok': ('tiktok_id', 'get_tiktok_metrics')
+}
+
+# Graph API fields requested per account
+INSTAGRAM_ACCOUNT_FIELDS = 'account_type,media_count,followers_count'
+FACEBOOK_PAGE_FIELDS = 'name,fan_count,engagement'
+
+# TikTok Business API account fields
+TIKTOK_ACCOUNT_FIELDS = '["username","display_name","followers_count","videos_count","likes_count"]'
+
+# TikTok returns errors as HTTP 200 with a non-zero body code; these mean the request was throttled
+TIKTOK_RATE_LIMIT_CODES = {40100}
+
+# Maximum lookups packed into one Graph API batch or ?ids= request
+GRAPH_BATCH_SIZE = 50
+
+# Shared by every connector in the process, so dashboard sessions and the scheduler make one
+# outbound call per account; lookup keys carry the API base URL and a token digest
+IN_FLIGHT = SingleFlight()
+
+def tiktok_error_code(response):
+    """Non-zero TikTok body error code of a 200 response, else 0"""
+    if response.status_code != 200:
+        return 0
+    try:
+        return response.json().get('code', 0)
+    except (ValueError, AttributeError):
+        return 0
+
 class SocialMediaConnector:
     """Social Media API integration for brand dashboard"""
 
     def __init__(self):
+        self.in_flight = IN_FLIGHT
+
         self.linkedin_token = os.getenv('LINKEDIN_ACCESS_TOKEN')
         self.instagram_token = os.getenv('INSTAGRAM_ACCESS_TOKEN')
         self.facebook_token = os.getenv('FACEBOOK_ACCESS_TOKEN')
         self.tiktok_token = os.getenv('TIKTOK_ACCESS_TOKEN')
 
+        # API base URLs (overridable for local stub servers)
+        self.linkedin_api_url = os.getenv('LINKEDIN_API_URL', 'https://api.linkedin.com/v2')
+        self.instagram_api_url = os.getenv('INSTAGRAM_API_URL', 'https://graph.instagram.com')
+        self.facebook_api_url = os.getenv('FACEBOOK_API_URL', 'https://graph.facebook.com/v18.0')
+        self.tiktok_api_url = os.getenv('TIKTOK_API_URL', 'https://business-api.tiktok.com/open_api/v1.3')
+
+        # Concurrency limits for the async refresh path
+        self.max_concurrency = int(os.getenv('SOCIAL_MAX_CONCURRENCY', '32'))
+        self.platform_concurrency = {
+            platform: int(os.getenv(f'{platform.upper()}_MAX_CONCURRENCY', '8'))
+            for platform in PLATFORM_FETCHERS
+        }
+
+        # Per-platform token buckets pacing calls within API quotas
+        self.rate_limiters = create_platform_limiters(PLATFORM_FETCHERS)
+
+        # Response cache keyed by endpoint+params with per-platform TTLs
+        self.response_cache = create_response_cache(PLATFORM_FETCHERS)
+
+        # Engagement rate is computed by streaming recent posts per account
+        self.engagement_enabled = os.getenv('ENGAGEMENT_ENABLED', 'true').lower() == 'true'
+
+        # High-water marks so each refresh only fetches posts since the last one
+        self.engagement_state = None
+        if os.getenv('ENGAGEMENT_INCREMENTAL', 'true').lower() == 'true':
+            self.engagement_state = engagement.EngagementStateStore()
+
+    def _platform_request(self, platform, method, url, calls=1, **kwargs):
+        """Rate-limited request against a platform API, counting `calls` against its quota"""
+        limiter = self.rate_limiters[platform]
+
+        def send():
+            waited = limiter.acquire(calls)
+            if waited > 1:
+                logger.info(f"{platform} call delayed {waited:.1f}s by rate limiter")
+
+            response = http_transport.request(method, url, **kwargs)
+            if platform == 'tiktok' and tiktok_error_code(response) in TIKTOK_RATE_LIMIT_CODES:
+                # Surface the in-body throttle as a 429 so the limiter and retries react to it
+                response.status_code = 429
+            limiter.update_from_response(response)
+
+            if response.status_code == 429:
+                logger.warning(f"{platform} API throttled request (429)")
+            return response
+
+        # Retries and the per-host circuit breaker wrap each paced attempt
+        return resilience.call_with_retry(method, url, send)
+
+    def _platform_get(self, platform, url, **kwargs):
+        """Cached, rate-limited GET against a platform API"""
+        cache_key = self.response_cache.make_key('GET', url, kwargs.get('params'), kwargs.get('headers'))
+        entry, fresh = self.response_cache.lookup(platform, cache_key)
+        if fresh:
+            return CachedResponse(entry)
+
+        # Stale entries with validators are revalidated instead of refetched
+        if entry:
+            kwargs['headers'] = {**kwargs.get('headers', {}), **self.response_cache.conditional_headers(entry)}
+
+        response = self._platform_request(platform, 'GET', url, **kwargs)
+
+        if response.status_code == 304 and entry:
+            return CachedResponse(self.response_cache.revalidated(platform, cache_key, entry))
+        # Error bodies served with a 200 (TikTok) must not be cached as successes
+        if response.status_code == 200 and not (platform == 'tiktok' and tiktok_error_code(response)):
+            self.response_cache.store(platform, cache_key, response)
+        return response
+
+    def add_engagement_metrics(self, platform, account_id, platform_data):
+        """Fill in engagement_rate from the account's recent posts"""
+        if not self.engagement_enabled:
+            return platform_data
+        try:
+            platform_data.update(
+                engagement.compute_engagement(
+                    self, platform, account_id, platform_data['followers'], self.engagement_state
+                )
+            )
+        except Exception as e:
+            logger.warning(f"{platform} engagement calculation failed for {account_id}: {str(e)}")
+        return platform_data
+
+    def lookup_key(self, platform, account_id):
+        """Coalescing key; only connectors calling the same API with the same token share a lookup"""
+        token = getattr(self, f'{platform}_token') or ''
+        token_digest = hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+        return (platform, getattr(self, f'{platform}_api_url'), token_digest, account_id)
+
+    def fetch_platform_metrics(self, platform, account_id):
+        """Fetch one account's metrics, sharing the call with concurrent identical lookups"""
+        fetcher = getattr(self, PLATFORM_FETCHERS[platform][1])
+        platform_data = self.in_flight.do(self.lookup_key(platform, account_id), fetcher, account_id)
+        # Every caller gets its own copy, so one brand's edits never leak into another's
+        return dict(platform_data) if platform_data else platform_data
+
+    def complete_platform_metrics(self, platform, account_id, account_data):
+        """Finish an account fetched in a batch, sharing its engagement scan with identical lookups"""
+        platform_data = self.in_flight.do(
+            self.lookup_key(platform, account_id), self.add_engagement_metrics, platform, account_id, account_data
+        )
+        return dict(platform_data) if platform_data else platform_data
+
+    def coalescing_stats(self):
+        """Return how many platform lookups ran versus joined an in-flight call"""
+        return self.in_flight.stats()
+
+    def save_engagement_state(self):
+        """Persist incremental engagement cursors after a refresh"""
+        if self.engagement_state:
+            try:
+                self.engagement_state.save()
+            except Exception as e:
+                logger.error(f"Error saving engagement state: {str(e)}")
+
+    def rate_limit_stats(self):
+        """Return per-platform rate limiter call and wait statistics"""
+        return {platform: limiter.stats() for platform, limiter in self.rate_limiters.items()}
+
+    def cache_stats(self):
+        """Return per-platform response cache hit/miss/revalidation counters"""
+        return self.response_cache.stats()
+
     def get_linkedin_metrics(self, company_id):
         """Fetch LinkedIn company page metrics"""
         try:
             headers = {'Authorization': f'Bearer {self.linkedin_token}'}
 
             # Followers endpoint
-            followers_url = f"https://api.linkedin.com/v2/networkSizes/{company_id}?edgeType=CompanyFollowedByMember"
-            followers_response = requests.get(followers_url, headers=headers)
+            followers_url = f"{self.linkedin_api_url}/networkSizes/{company_id}?edgeType=CompanyFollowedByMember"
+            followers_response = self._platform_get('linkedin', followers_url, headers=headers)
 
             if followers_response.status_code == 200:
                 followers_data = followers_response.json()
                 follower_count = followers_data.get('firstDegreeSize', 0)
 
-                return {
+                return self.add_engagement_metrics('linkedin', company_id, {
                     'platform': 'LinkedIn',
                     'followers': follower_count,
-                    'engagement_rate': None,  # Requires additional API calls
+                    'engagement_rate': None,
                     'last_updated': datetime.now().isoformat()
-                }
+                })
             else:
                 logger.error(f"LinkedIn API error: {followers_response.status_code}")
                 return None
@@ -52,22 +221,16 @@ class SocialMediaConnector:
         """Fetch Instagram business account metrics"""
         try:
             # Instagram Basic Display API
-            base_url = "https://graph.instagram.com"
+            base_url = self.instagram_api_url
 
             # Get account info
-            account_url = f"{base_url}/{instagram_account_id}?fields=account_type,media_count,followers_count&access_token={self.instagram_token}"
-            account_response = requests.get(account_url)
+            account_url = f"{base_url}/{instagram_account_id}?fields={INSTAGRAM_ACCOUNT_FIELDS}&access_token={self.instagram_token}"
+            account_response = self._platform_get('instagram', account_url)
 
             if account_response.status_code == 200:
-                account_data = account_response.json()
-
-                return {
-                    'platform': 'Instagram',
-                    'followers': account_data.get('followers_count', 0),
-                    'media_count': account_data.get('media_count', 0),
-                    'engagement_rate': None,  # Calculate from recent posts
-                    'last_updated': datetime.now().isoformat()
-                }
+                return self.add_engagement_metrics(
+                    'instagram', instagram_account_id, self._parse_instagram_account(account_response.json())
+                )
             else:
                 logger.error(f"Instagram API error: {account_response.status_code}")
                 return None
@@ -79,21 +242,16 @@ class SocialMediaConnector:
     def get_facebook_metrics(self, page_id):
         """Fetch Facebook page metrics"""
         try:
-            base_url = "https://graph.facebook.com/v18.0"
+            base_url = self.facebook_api_url
 
             # Get page info
-            page_url = f"{base_url}/{page_id}?fields=name,fan_count,engagement&access_token={self.facebook_token}"
-            page_response = requests.get(page_url)
+            page_url = f"{base_url}/{page_id}?fields={FACEBOOK_PAGE_FIELDS}&access_token={self.facebook_token}"
+            page_response = self._platform_get('facebook', page_url)
 
             if page_response.status_code == 200:
-                page_data = page_response.json()
-
-                return {
-                    'platform': 'Facebook',
-                    'followers': page_data.get('fan_count', 0),
-                    'engagement_rate': None,
-                    'last_updated': datetime.now().isoformat()
-                }
+                return self.add_engagement_metrics(
+                    'facebook', page_id, self._parse_facebook_page(page_response.json())
+                )
             else:
                 logger.error(f"Facebook API error: {page_response.status_code}")
                 return None
@@ -102,6 +260,115 @@ class SocialMediaConnector:
             logger.error(f"Facebook connection error: {str(e)}")
             return None
 
+    def get_tiktok_metrics(self, business_id):
+        """Fetch TikTok business account metrics"""
+        try:
+            headers = {'Access-Token': self.tiktok_token}
+
+            # Get account info
+            account_url = f"{self.tiktok_api_url}/business/get/?business_id={business_id}&fields={TIKTOK_ACCOUNT_FIELDS}"
+            account_response = self._platform_get('tiktok', account_url, headers=headers)
+
+            if account_response.status_code != 200:
+                logger.error(f"TikTok API error: {account_response.status_code}")
+                return None
+
+            # TikTok reports API errors in the body with a non-zero code
+            account_body = account_response.json()
+            if account_body.get('code', 0) != 0:
+                logger.error(f"TikTok API error: {account_body.get('code')} {account_body.get('message')}")
+                return None
+
+            account_data = account_body.get('data', {})
+            return self.add_engagement_metrics('tiktok', business_id, {
+                'platform': 'TikTok',
+                'followers': account_data.get('followers_count', 0),
+                'media_count': account_data.get('videos_count', 0),
+                'engagement_rate': None,
+                'last_updated': datetime.now().isoformat()
+            })
+
+        except Exception as e:
+            logger.error(f"TikTok connection error: {str(e)}")
+            return None
+
+    def _parse_instagram_account(self, account_data):
+        """Convert an Instagram account payload to dashboard metrics"""
+        return {
+            'platform': 'Instagram',
+            'followers': account_data.get('followers_count', 0),
+            'media_count': account_data.get('media_count', 0),
+            'engagement_rate': None,
+            'last_updated': datetime.now().isoformat()
+        }
+
+    def _parse_facebook_page(self, page_data):
+        """Convert a Facebook page payload to dashboard metrics"""
+        return {
+            'platform': 'Facebook',
+            'followers': page_data.get('fan_count', 0),
+            'engagement_rate': None,
+            'last_updated': datetime.now().isoformat()
+        }
+
+    def get_instagram_accounts_batch(self, instagram_account_ids):
+        """Fetch many Instagram account payloads using the multi-id ?ids= form"""
+        # Accounts missing from the result need a single lookup
+        results = {}
+        account_ids = list(dict.fromkeys(instagram_account_ids))
+
+        for start in range(0, len(account_ids), GRAPH_BATCH_SIZE):
+            chunk = account_ids[start:start + GRAPH_BATCH_SIZE]
+            try:
+                ids_url = f"{self.instagram_api_url}/?ids={','.join(chunk)}&fields={INSTAGRAM_ACCOUNT_FIELDS}&access_token={self.instagram_token}"
+                response = self._platform_get('instagram', ids_url, calls=len(chunk))
+
+                if response.status_code == 200:
+                    for account_id, account_data in response.json().items():
+                        results[account_id] = self._parse_instagram_account(account_data)
+                    continue
+
+                # One bad ID fails the whole multi-id lookup, so the chunk falls back to single lookups
+                logger.warning(f"Instagram multi-id lookup failed ({response.status_code}), falling back to single lookups")
+            except Exception as e:
+                logger.error(f"Instagram batch connection error: {str(e)}")
+
+        return results
+
+    def get_facebook_pages_batch(self, page_ids):
+        """Fetch many Facebook page payloads with Graph API batch requests"""
+        # Pages missing from the result need a single lookup; None marks a page the API rejected
+        results = {}
+        page_ids = list(dict.fromkeys(page_ids))
+
+        for start in range(0, len(page_ids), GRAPH_BATCH_SIZE):
+            chunk = page_ids[start:start + GRAPH_BATCH_SIZE]
+            try:
+                batch = [
+                    {'method': 'GET', 'relative_url': f"{page_id}?fields={FACEBOOK_PAGE_FIELDS}"}
+                    for page_id in chunk
+                ]
+                response = self._platform_request(
+                    'facebook', 'POST', f"{self.facebook_api_url}/",
+                    calls=len(chunk),
+                    data={'access_token': self.facebook_token, 'batch': json.dumps(batch)}
+                )
+
+                if response.status_code == 200:
+                    # Responses come back in request order; null entries timed out server-side
+                    for page_id, item in zip(chunk, response.json()):
+                        if item and item.get('code') == 200:
+                            results[page_id] = self._parse_facebook_page(json.loads(item['body']))
+                        elif item:
+                            logger.error(f"Facebook batch item error for {page_id}: {item.get('code')}")
+                            results[page_id] = None
+                else:
+                    logger.warning(f"Facebook batch API error ({response.status_code}), falling back to single lookups")
+            except Exception as e:
+                logger.error(f"Facebook batch connection error: {str(e)}")
+
+        return results
+
     def refresh_all_brand_data(self, brand_config):
         """Refresh data for all brands"""
         updated_data = {}
@@ -109,36 +376,116 @@ class SocialMediaConnector:
         for brand_name, config in brand_config.items():
             brand_metrics = {}
 
-            if 'linkedin_id' in config:
-                linkedin_data = self.get_linkedin_metrics(config['linkedin_id'])
-                if linkedin_data:
-                    brand_metrics['linkedin'] = linkedin_data
-
-            if 'instagram_id' in config:
-                instagram_data = self.get_instagram_metrics(config['instagram_id'])
-                if instagram_data:
-                    brand_metrics['instagram'] = instagram_data
-
-            if 'facebook_id' in config:
-                facebook_data = self.get_facebook_metrics(config['facebook_id'])
-                if facebook_data:
-                    brand_metrics['facebook'] = facebook_data
+            for platform, (config_key, _) in PLATFORM_FETCHERS.items():
+                if config_key in config:
+                    platform_data = self.fetch_platform_metrics(platform, config[config_key])
+                    if platform_data:
+                        brand_metrics[platform] = platform_data
 
             updated_data[brand_name] = brand_metrics
 
+        self.save_engagement_state()
         return updated_data
 
+    def refresh_all_brand_data_batched(self, brand_config, max_concurrency=None, platform_concurrency=None):
+        """Refresh data for all brands, batching Facebook and Instagram lookups"""
+        return asyncio.run(
+            self.refresh_all_brand_data_async(brand_config, max_concurrency, platform_concurrency, batched=True)
+        )
+
+    async def refresh_all_brand_data_async(self, brand_config, max_concurrency=None, platform_concurrency=None,
+                                           batched=False):
+        """Refresh data for all brands with platform calls fanned out concurrently"""
+        # batched packs Instagram and Facebook account lookups into multi-id and batch requests
+        max_concurrency = max_concurrency or self.max_concurrency
+        platform_concurrency = {**self.platform_concurrency, **(platform_concurrency or {})}
+        batch_fetchers = {
+            'instagram': self.get_instagram_accounts_batch,
+            'facebook': self.get_facebook_pages_batch
+        } if batched else {}
+
+        global_limit = asyncio.Semaphore(max_concurrency)
+        platform_limits = {
+            platform: asyncio.Semaphore(limit)
+            for platform, limit in platform_concurrency.items()
+        }
+        loop = asyncio.get_running_loop()
+
+        # The fetchers are blocking, so each call runs on a worker thread; batch requests get
+        # threads of their own so they never wait behind the per-account calls
+        with ThreadPoolExecutor(max_workers=max_concurrency + len(batch_fetchers)) as executor:
+
+            async def fetch(platform, account_id):
+                async with platform_limits[platform], global_limit:
+                    return await loop.run_in_executor(
+                        executor, self.fetch_platform_metrics, platform, account_id
+                    )
+
+            async def complete(platform, account_id, accounts):
+                # Accounts the batch could not return fall back to a single lookup
+                if account_id not in accounts:
+                    return await fetch(platform, account_id)
+                if accounts[account_id] is None:
+                    return None
+                async with platform_limits[platform], global_limit:
+                    return await loop.run_in_executor(
+                        executor, self.complete_platform_metrics, platform, account_id, accounts[account_id]
+                    )
+
+            async def fetch_batched(platform, account_ids):
+                accounts = await loop.run_in_executor(executor, batch_fetchers[platform], account_ids)
+                return await asyncio.gather(*(complete(platform, account_id, accounts) for account_id in account_ids))
+
+            lookups = [
+                (brand_name, platform, config[config_key])
+                for brand_name, config in brand_config.items()
+                for platform, (config_key, _) in PLATFORM_FETCHERS.items()
+                if config_key in config
+            ]
+
+            # Accounts shared by several brands are fetched once per refresh
+            unique_lookups = list(dict.fromkeys((platform, account_id) for _, platform, account_id in lookups))
+            single_lookups = [lookup for lookup in unique_lookups if lookup[0] not in batch_fetchers]
+            batched_lookups = {
+                platform: [account_id for lookup_platform, account_id in unique_lookups if lookup_platform == platform]
+                for platform in batch_fetchers
+            }
+
+            # Batch requests, their per-account engagement and the other platforms all run together
+            single_results, *batched_results = await asyncio.gather(
+                asyncio.gather(*(fetch(platform, account_id) for platform, account_id in single_lookups)),
+                *(fetch_batched(platform, account_ids) for platform, account_ids in batched_lookups.items())
+            )
+            results_by_lookup = dict(zip(single_lookups, single_results))
+            for (platform, account_ids), results in zip(batched_lookups.items(), batched_results):
+                results_by_lookup.update(zip(((platform, account_id) for account_id in account_ids), results))
+
+        updated_data = {brand_name: {} for brand_name in brand_config}
+        for brand_name, platform, account_id in lookups:
+            platform_data = results_by_lookup[(platform, account_id)]
+            if platform_data:
+                # Brands sharing an account each get their own dict
+                updated_data[brand_name][platform] = dict(platform_data)
+
+        self.save_engagement_state()
+        return updated_data
+
+    def refresh_all_brand_data_concurrent(self, brand_config, max_concurrency=None, platform_concurrency=None):
+        """Synchronous wrapper around refresh_all_brand_data_async"""
+        return asyncio.run(
+            self.refresh_all_brand_data_async(brand_config, max_concurrency, platform_concurrency)
+        )
+
 def save_metrics_to_file(metrics_data, filename='social_metrics.json'):
-    """Save metrics to JSON file"""
-    with open(filename, 'w') as f:
-        json.dump(metrics_data, f, indent=2)
+    """Save metrics to a snapshot file (.json, or compact .msgpack)"""
+    atomic_io.write_bytes(filename, snapshot_format.dumps(metrics_data, filename))
     logger.info(f"Metrics saved to {filename}")
 
 def load_metrics_from_file(filename='social_metrics.json'):
-    """Load metrics from JSON file"""
+    """Load metrics from a snapshot file in the format its extension names"""
     try:
-        with open(filename, 'r') as f:
-            return json.load(f)
+        with open(filename, 'rb') as f:
+            return snapshot_format.loads(f.read(), filename)
     except FileNotFoundError:
         logger.warning(f"Metrics file {filename} not found")
         return {}
@@ -160,7 +507,8 @@ if __name__ == "__main__":
         "TravelXec": {
             "instagram_id": "travel.xec",
             "facebook_id": "TravelXec",
-            "linkedin_id": "travelxec"
+            "linkedin_id": "travelxec",
+            "tiktok_id": os.getenv('TRAVELXEC_TIKTOK_BUSINESS_ID')
         },
         "Schmooze Media": {
             "instagram_id": "schmoozemedia",
@@ -172,8 +520,14 @@ if __name__ == "__main__":
         }
     }
 
+    # Accounts without a configured ID are skipped
+    brand_config = {
+        brand_name: {key: value for key, value in config.items() if value}
+        for brand_name, config in brand_config.items()
+    }
+
     # Refresh data
-    updated_metrics = connector.refresh_all_brand_data(brand_config)
+    updated_metrics = connector.refresh_all_brand_data_concurrent(brand_config)
     save_metrics_to_file(updated_metrics)
 
     print("Social media data refresh completed!")
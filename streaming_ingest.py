@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import time
+
+import pandas as pd
+
+import atomic_io
+
+from dataset_loader import TABLE_FILES, parse_dtypes, read_csv_header
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 250000
+
+# How each large table is reduced to per-brand daily metrics
+STREAM_AGGREGATIONS = {
+    'leads': {
+        'date_column': 'created_at',
+        'count_metric': 'daily_leads',
+        'count_by': 'status',
+        'sum_columns': {}
+    },
+    'campaigns': {
+        'date_column': 'start_date',
+        'count_metric': 'daily_campaigns',
+        'count_by': None,
+        'sum_columns': {
+            'spend': 'campaign_spend',
+            'impressions': 'campaign_impressions',
+            'clicks': 'campaign_clicks',
+            'conversions': 'campaign_conversions'
+        }
+    }
+}
+
+
+def iter_csv_chunks(file_path, table_name, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Read only the columns the aggregation needs, chunk_rows at a time"""
+    spec = STREAM_AGGREGATIONS[table_name]
+    header = read_csv_header(file_path)
+    wanted = {'brand_name', spec['date_column'], spec['count_by'], *spec['sum_columns']}
+    columns = [column for column in header if column in wanted]
+    with pd.read_csv(file_path, usecols=columns, dtype=parse_dtypes(table_name, columns), chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def clean_chunks(chunks, table_name, brands=None):
+    """Drop rows without a brand or a parseable date and cast the date to a day"""
+    date_column = STREAM_AGGREGATIONS[table_name]['date_column']
+    for chunk in chunks:
+        chunk = chunk.assign(day=pd.to_datetime(chunk[date_column], errors='coerce').dt.floor('D'))
+        # Summed columns must be numbers; stray text counts as missing
+        for column in STREAM_AGGREGATIONS[table_name]['sum_columns']:
+            if column in chunk.columns:
+                chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+        chunk = chunk.dropna(subset=['brand_name', 'day'])
+        if brands:
+            chunk = chunk[chunk['brand_name'].isin(brands)]
+        yield chunk
+
+
+def aggregate_chunks(chunks, table_name):
+    """Fold chunks into running per-brand/day totals; memory grows with brand-days, not rows"""
+    spec = STREAM_AGGREGATIONS[table_name]
+    totals = None
+    for chunk in chunks:
+        grouped = chunk.groupby(['brand_name', 'day'], observed=True)
+        partial = grouped.size().to_frame(spec['count_metric'])
+
+        for column, metric_name in spec['sum_columns'].items():
+            if column in chunk.columns:
+                partial[metric_name] = grouped[column].sum()
+
+        count_by = spec['count_by']
+        if count_by and count_by in chunk.columns:
+            by_value = chunk.groupby(['brand_name', 'day', count_by], observed=True).size().unstack(fill_value=0)
+            by_value.columns = [f"{spec['count_metric']}_{str(value).lower().replace(' ', '_')}" for value in by_value.columns]
+            partial = partial.join(by_value)
+
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+
+    return totals
+
+
+def totals_to_metrics(totals):
+    """Long-format metric rows ready for the metric store"""
+    if totals is None or totals.empty:
+        return pd.DataFrame(columns=['brand_name', 'metric_name', 'metric_value', 'timestamp'])
+
+    metrics = totals.fillna(0).rename_axis(columns='metric_name').stack().rename('metric_value').reset_index()
+    return metrics.rename(columns={'day': 'timestamp'})[['brand_name', 'metric_name', 'metric_value', 'timestamp']]
+
+
+class StreamingIngestor:
+    """Chunked ingestion of the large Data-tracker tables into the metric store"""
+
+    def __init__(self, repo_path, metric_store, state_path='./data/processed/ingest_state.json', chunk_rows=None):
+        self.repo_path = repo_path
+        self.metric_store = metric_store
+        self.state_path = state_path
+        self.chunk_rows = chunk_rows or int(os.getenv('INGEST_CHUNK_ROWS', str(DEFAULT_CHUNK_ROWS)))
+        # Months retention has already expired are not re-created from the source
+        self.retention_days = int(os.getenv('METRIC_RAW_RETENTION_DAYS', '90'))
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, 'r') as f:
+            return json.load(f)
+
+    def save_state(self, state):
+        atomic_io.write_json(self.state_path, state, indent=2)
+
+    def ingest(self, table_name, force=False):
+        """Stream one table into the metric store; skipped when the source is unchanged"""
+        file_path = os.path.join(self.repo_path, TABLE_FILES[table_name])
+        if not os.path.exists(file_path):
+            logger.warning(f"Data file not found: {file_path}")
+            return None
+
+        stat = os.stat(file_path)
+        source_key = f"{stat.st_mtime_ns}:{stat.st_size}"
+        state = self.load_state()
+        if not force and state.get(table_name) == source_key:
+            logger.info(f"{table_name} unchanged since last ingest, skipping")
+            return {'table': table_name, 'skipped': True}
+
+        started = time.perf_counter()
+        counters = {'rows': 0, 'chunks': 0}
+
+        def counted(chunks):
+            for chunk in chunks:
+                counters['rows'] += len(chunk)
+                counters['chunks'] += 1
+                yield chunk
+
+        chunks = counted(iter_csv_chunks(file_path, table_name, self.chunk_rows))
+        totals = aggregate_chunks(clean_chunks(chunks, table_name), table_name)
+        metrics = totals_to_metrics(totals)
+        elapsed = time.perf_counter() - started
+
+        write_started = time.perf_counter()
+        if self.metric_store:
+            # The aggregate covers the whole file, so it replaces this table's earlier ingest
+            # rather than appending to it; re-ingesting an edited file never duplicates history
+            self.metric_store.replace_source(
+                f"ingest-{table_name}", metrics, start=self.metric_store.retention_start(self.retention_days)
+            )
+        write_elapsed = time.perf_counter() - write_started
+        state[table_name] = source_key
+        self.save_state(state)
+
+        result = {
+            'table': table_name,
+            'rows': counters['rows'],
+            'chunks': counters['chunks'],
+            'metric_rows': len(metrics),
+            'seconds': round(elapsed, 3),
+            'rows_per_sec': round(counters['rows'] / elapsed) if elapsed else 0,
+            'write_seconds': round(write_elapsed, 3)
+        }
+        logger.info(f"Ingested {table_name}: {result}")
+        return result
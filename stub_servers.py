@@ -0,0 +1,490 @@
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """Threaded local HTTP server with request accounting"""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, handler_class, latency=0.0, host='127.0.0.1', port=0, posts_per_account=0):
+        super().__init__((host, port), handler_class)
+        self.latency = latency
+        self.posts_per_account = posts_per_account
+        self.request_count = 0
+        self.requests_by_path = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record_request(self, method, path):
+        """Count an incoming request"""
+        with self._lock:
+            self.request_count += 1
+            key = f"{method} {path.split('?')[0]}"
+            self.requests_by_path[key] = self.requests_by_path.get(key, 0) + 1
+
+    def reset_counters(self):
+        """Reset request accounting"""
+        with self._lock:
+            self.request_count = 0
+            self.requests_by_path = {}
+
+    def start(self):
+        """Serve requests on a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Shut the server down"""
+        self.shutdown()
+        self.server_close()
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Base handler that writes JSON responses after the configured latency"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode()
+        headers = dict(headers or {})
+
+        # GET responses carry an ETag and honour If-None-Match
+        if self.command == 'GET' and status == 200:
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            headers['ETag'] = etag
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class SocialMediaStubHandler(StubRequestHandler):
+    """Answers LinkedIn, Instagram, Facebook and TikTok lookups, including Graph batch and ?ids= forms"""
+
+    # Synthetic posts per account, one every POST_INTERVAL_HOURS going back from now
+    POST_INTERVAL_HOURS = 6
+
+    def post_at(self, index):
+        created = datetime.now(timezone.utc) - timedelta(hours=index * self.POST_INTERVAL_HOURS)
+        return created, 40 + index % 7, 5 + index % 3, index % 2
+
+    def graph_posts(self, url, query, time_field):
+        """Cursor-paginated Instagram /media or Facebook /posts page"""
+        limit = int(query.get('limit', ['25'])[0])
+        offset = int(query.get('after', ['0'])[0])
+        end = min(offset + limit, self.server.posts_per_account)
+
+        data = []
+        for index in range(offset, end):
+            created, likes, comments, shares = self.post_at(index)
+            data.append({
+                'id': f"post_{index}",
+                time_field: created.strftime('%Y-%m-%dT%H:%M:%S+0000'),
+                'like_count': likes,
+                'comments_count': comments,
+                'reactions': {'summary': {'total_count': likes}},
+                'comments': {'summary': {'total_count': comments}},
+                'shares': {'count': shares}
+            })
+
+        paging = {'cursors': {'after': str(end)}}
+        if end < self.server.posts_per_account:
+            next_query = {**{name: values[0] for name, values in query.items()}, 'after': str(end)}
+            paging['next'] = f"{self.server.base_url}{url.path}?{urlencode(next_query)}"
+        return {'data': data, 'paging': paging}
+
+    def linkedin_shares(self, query):
+        start = int(query.get('start', ['0'])[0])
+        count = int(query.get('count', ['50'])[0])
+        end = min(start + count, self.server.posts_per_account)
+        return {
+            'elements': [
+                {'id': f"urn:li:share:{index}", 'created': {'time': int(self.post_at(index)[0].timestamp() * 1000)}}
+                for index in range(start, end)
+            ],
+            'paging': {'start': start, 'count': count, 'total': self.server.posts_per_account}
+        }
+
+    def tiktok_videos(self, query):
+        """Cursor-paginated TikTok /business/video/list/ page"""
+        count = int(query.get('max_count', ['20'])[0])
+        cursor = int(query.get('cursor', ['0'])[0])
+        end = min(cursor + count, self.server.posts_per_account)
+
+        videos = []
+        for index in range(cursor, end):
+            created, likes, comments, shares = self.post_at(index)
+            videos.append({
+                'item_id': f"video_{index}",
+                'create_time': int(created.timestamp()),
+                'likes': likes,
+                'comments': comments,
+                'shares': shares
+            })
+        return {
+            'code': 0,
+            'message': 'OK',
+            'data': {'videos': videos, 'cursor': end, 'has_more': end < self.server.posts_per_account}
+        }
+
+    def linkedin_share_statistics(self, query):
+        elements = []
+        for name, values in query.items():
+            if name.startswith('shares['):
+                index = int(values[0].rsplit(':', 1)[-1])
+                _, likes, comments, shares = self.post_at(index)
+                elements.append({
+                    'share': values[0],
+                    'totalShareStatistics': {'likeCount': likes, 'commentCount': comments, 'shareCount': shares}
+                })
+        return {'elements': elements}
+
+    def account_payload(self, account_id):
+        return {
+            'id': account_id,
+            'firstDegreeSize': 1200,
+            'followers_count': 3400,
+            'media_count': 150,
+            'fan_count': 5600
+        }
+
+    def do_GET(self):
+        self.server.record_request('GET', self.path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+
+        if url.path.endswith('/media'):
+            self.send_json(self.graph_posts(url, query, 'timestamp'))
+            return
+        if url.path.endswith('/posts'):
+            self.send_json(self.graph_posts(url, query, 'created_time'))
+            return
+        if url.path.endswith('/shares'):
+            self.send_json(self.linkedin_shares(query))
+            return
+        if url.path.endswith('/business/get/'):
+            account = self.account_payload(query.get('business_id', [''])[0])
+            self.send_json({'code': 0, 'message': 'OK', 'data': {**account, 'followers_count': 8900, 'videos_count': 320}})
+            return
+        if url.path.endswith('/business/video/list/'):
+            self.send_json(self.tiktok_videos(query))
+            return
+        if url.path.endswith('/organizationalEntityShareStatistics'):
+            self.send_json(self.linkedin_share_statistics(query))
+            return
+
+        # Graph API multi-id lookup: /?ids=a,b,c
+        if 'ids' in query:
+            account_ids = query['ids'][0].split(',')
+            self.send_json({account_id: self.account_payload(account_id) for account_id in account_ids})
+            return
+
+        self.send_json(self.account_payload(url.path.rstrip('/').split('/')[-1]))
+
+    def do_POST(self):
+        self.server.record_request('POST', self.path)
+        body = parse_qs(self.read_body().decode())
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        # Graph API batch request: one sub-response per relative_url
+        batch = json.loads(body.get('batch', ['[]'])[0])
+        self.send_json([
+            {
+                'code': 200,
+                'headers': [],
+                'body': json.dumps(self.account_payload(item['relative_url'].split('?')[0]))
+            }
+            for item in batch
+        ])
+
+
+def start_social_media_stub(latency=0.0, posts_per_account=0):
+    """Start a social media API stub server on a free local port"""
+    return StubHTTPServer(SocialMediaStubHandler, latency=latency, posts_per_account=posts_per_account).start()
+
+
+class NotionStubServer(StubHTTPServer):
+    """Stub server holding Notion pages and blocks in memory, with rate limiting and 429 injection"""
+
+    def __init__(self, latency=0.0, rate_per_second=None, burst=3, throttle_probability=0.0, seed=None):
+        super().__init__(NotionStubHandler, latency=latency)
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.throttle_probability = throttle_probability
+        self.random = random.Random(seed)
+        self.pages = {}
+        self.blocks = {}
+        self.throttled = 0
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._ids = itertools.count(1)
+
+    def new_id(self):
+        return str(uuid.UUID(int=next(self._ids)))
+
+    def reset_counters(self):
+        super().reset_counters()
+        with self._lock:
+            self.throttled = 0
+
+    def throttle(self):
+        """Seconds the caller should wait if this request is rejected with 429, else None"""
+        with self._lock:
+            if self.throttle_probability and self.random.random() < self.throttle_probability:
+                self.throttled += 1
+                return 1.0
+            if not self.rate_per_second:
+                return None
+
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_second)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            self.throttled += 1
+            return (1 - self._tokens) / self.rate_per_second
+
+
+class NotionStubHandler(StubRequestHandler):
+    """Subset of the Notion API used by NotionDatabaseConnector: pages, database query, block children"""
+
+    def begin(self, method):
+        """Account, delay and possibly throttle a request; returns (path parts, query) or None"""
+        self.server.record_request(method, self.path)
+        body = self.read_body()
+        self.body = json.loads(body) if body else {}
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        retry_after = self.server.throttle()
+        if retry_after is not None:
+            self.send_json(
+                {'object': 'error', 'status': 429, 'code': 'rate_limited'},
+                status=429, headers={'Retry-After': f"{retry_after:.2f}"}
+            )
+            return None
+
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        if parts[:1] == ['v1']:
+            parts = parts[1:]
+        return parts, parse_qs(url.query)
+
+    def error(self, status, message):
+        self.send_json({'object': 'error', 'status': status, 'message': message}, status=status)
+
+    def store_children(self, parent_id, children):
+        if len(children) > 100:
+            self.error(400, 'body.children.length should be ≤ 100')
+            return False
+        with self.server._lock:
+            for child in children:
+                block_id = self.server.new_id()
+                self.server.blocks[block_id] = {**child, 'id': block_id, 'parent': parent_id}
+                self.server.pages[parent_id]['children'].append(block_id)
+        return True
+
+    def do_POST(self):
+        request = self.begin('POST')
+        if request is None:
+            return
+        parts, _ = request
+
+        if parts == ['pages']:
+            with self.server._lock:
+                page_id = self.server.new_id()
+                self.server.pages[page_id] = {'properties': self.body.get('properties', {}), 'children': []}
+            if self.store_children(page_id, self.body.get('children', [])):
+                self.send_json({'object': 'page', 'id': page_id, 'properties': self.body.get('properties', {})})
+            return
+
+        if len(parts) == 3 and parts[0] == 'databases' and parts[2] == 'query':
+            page_size = min(int(self.body.get('page_size', 100)), 100)
+            with self.server._lock:
+                page_ids = sorted(self.server.pages)
+                start = page_ids.index(self.body['start_cursor']) if self.body.get('start_cursor') in self.server.pages else 0
+                selected = page_ids[start:start + page_size]
+                results = [
+                    {'object': 'page', 'id': page_id, 'properties': self.server.pages[page_id]['properties']}
+                    for page_id in selected
+                ]
+            has_more = start + page_size < len(page_ids)
+            self.send_json({
+                'object': 'list',
+                'results': results,
+                'has_more': has_more,
+                'next_cursor': page_ids[start + page_size] if has_more else None
+            })
+            return
+
+        self.error(404, f"Unknown endpoint {self.path}")
+
+    def do_PATCH(self):
+        request = self.begin('PATCH')
+        if request is None:
+            return
+        parts, _ = request
+
+        if len(parts) == 2 and parts[0] == 'pages':
+            with self.server._lock:
+                page = self.server.pages.get(parts[1])
+                if page is not None:
+                    page['properties'] = {**page['properties'], **self.body.get('properties', {})}
+            if page is None:
+                self.error(404, 'Could not find page')
+            else:
+                self.send_json({'object': 'page', 'id': parts[1], 'properties': page['properties']})
+            return
+
+        if len(parts) == 3 and parts[0] == 'blocks' and parts[2] == 'children':
+            if parts[1] not in self.server.pages:
+                self.error(404, 'Could not find block')
+            elif self.store_children(parts[1], self.body.get('children', [])):
+                self.send_json({'object': 'list', 'results': []})
+            return
+
+        self.error(404, f"Unknown endpoint {self.path}")
+
+    def do_GET(self):
+        request = self.begin('GET')
+        if request is None:
+            return
+        parts, query = request
+
+        if len(parts) == 3 and parts[0] == 'blocks' and parts[2] == 'children':
+            page_size = min(int(query.get('page_size', ['100'])[0]), 100)
+            start = int(query.get('start_cursor', ['0'])[0])
+            with self.server._lock:
+                page = self.server.pages.get(parts[1])
+                child_ids = list(page['children']) if page else []
+                results = [self.server.blocks[block_id] for block_id in child_ids[start:start + page_size]]
+            if page is None:
+                self.error(404, 'Could not find block')
+                return
+            has_more = start + page_size < len(child_ids)
+            self.send_json({
+                'object': 'list',
+                'results': results,
+                'has_more': has_more,
+                'next_cursor': str(start + page_size) if has_more else None
+            })
+            return
+
+        self.error(404, f"Unknown endpoint {self.path}")
+
+    def do_DELETE(self):
+        request = self.begin('DELETE')
+        if request is None:
+            return
+        parts, _ = request
+
+        if len(parts) == 2 and parts[0] == 'blocks':
+            with self.server._lock:
+                block = self.server.blocks.pop(parts[1], None)
+                if block is not None:
+                    self.server.pages[block['parent']]['children'].remove(parts[1])
+            if block is None:
+                self.error(404, 'Could not find block')
+            else:
+                self.send_json({**block, 'archived': True})
+            return
+
+        self.error(404, f"Unknown endpoint {self.path}")
+
+
+def start_notion_stub(latency=0.0, rate_per_second=None, burst=3, throttle_probability=0.0, seed=None):
+    """Start a Notion API stub server on a free local port"""
+    return NotionStubServer(
+        latency=latency, rate_per_second=rate_per_second, burst=burst,
+        throttle_probability=throttle_probability, seed=seed
+    ).start()
+
+
+class WebhookStubServer(StubHTTPServer):
+    """Stub webhook receiver recording accepted deliveries, with random 503 injection"""
+
+    def __init__(self, latency=0.0, failure_probability=0.0, seed=None):
+        super().__init__(WebhookStubHandler, latency=latency)
+        self.failure_probability = failure_probability
+        self.random = random.Random(seed)
+        self.deliveries = []
+        self.failures = 0
+
+    def reset_counters(self):
+        super().reset_counters()
+        with self._lock:
+            self.deliveries = []
+            self.failures = 0
+
+    def should_fail(self):
+        with self._lock:
+            if self.failure_probability and self.random.random() < self.failure_probability:
+                self.failures += 1
+                return True
+            return False
+
+
+class WebhookStubHandler(StubRequestHandler):
+    """Accepts POSTs on any path as webhook deliveries"""
+
+    def do_POST(self):
+        self.server.record_request('POST', self.path)
+        body = self.read_body()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.server.should_fail():
+            self.send_json({'error': 'unavailable'}, status=503)
+            return
+
+        with self.server._lock:
+            self.server.deliveries.append({
+                'path': urlsplit(self.path).path,
+                'idempotency_key': self.headers.get('Idempotency-Key'),
+                'payload': json.loads(body) if body else None
+            })
+        self.send_json({'accepted': True})
+
+
+def start_webhook_stub(latency=0.0, failure_probability=0.0, seed=None):
+    """Start a webhook receiver stub server on a free local port"""
+    return WebhookStubServer(latency=latency, failure_probability=failure_probability, seed=seed).start()
@@ -0,0 +1,56 @@
+import math
+import re
+
+import pytest
+
+from benchmarks import make_brand_config, stub_social_connector
+from social_media_connector import GRAPH_BATCH_SIZE
+from stub_servers import start_social_media_stub
+
+
+def without_timestamps(refresh):
+    """Refresh results minus the per-fetch last_updated stamps"""
+    return {
+        brand_name: {
+            platform: {key: value for key, value in platform_data.items() if key != 'last_updated'}
+            for platform, platform_data in brand_metrics.items()
+        }
+        for brand_name, brand_metrics in refresh.items()
+    }
+
+
+@pytest.fixture
+def stub_server():
+    server = start_social_media_stub(posts_per_account=5)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def connector(stub_server):
+    connector = stub_social_connector(stub_server)
+    # Engagement included, so batched accounts also go through post pagination
+    connector.engagement_enabled = True
+    connector.engagement_state = None
+    return connector
+
+
+@pytest.mark.parametrize('brand_count', [1, 50, 120])
+def test_batched_refresh_packs_graph_lookups(stub_server, connector, brand_count):
+    connector.refresh_all_brand_data_batched(make_brand_config(brand_count))
+
+    expected_batches = math.ceil(brand_count / GRAPH_BATCH_SIZE)
+    assert stub_server.requests_by_path.get('GET /', 0) == expected_batches
+    assert stub_server.requests_by_path.get('POST /', 0) == expected_batches
+    # No per-account Instagram or Facebook lookups on top of the batches (post pages are expected)
+    assert not any(re.fullmatch(r'GET /(brand_|Brand)\d+', path) for path in stub_server.requests_by_path)
+
+
+def test_batched_refresh_matches_per_page_refresh(stub_server, connector):
+    brand_config = make_brand_config(60)
+
+    per_page = connector.refresh_all_brand_data(brand_config)
+    batched = connector.refresh_all_brand_data_batched(brand_config)
+
+    assert without_timestamps(batched) == without_timestamps(per_page)
+    assert all(set(brand_metrics) == {'linkedin', 'instagram', 'facebook', 'tiktok'} for brand_metrics in batched.values())
@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+from dotenv import load_dotenv
+
+import resilience
+from rate_limiter import parse_retry_after
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        destination TEXT NOT NULL,
+        url TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL NOT NULL,
+        leased_until REAL NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        delivered_at REAL,
+        last_status INTEGER,
+        last_error TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS outbox_queue ON outbox (destination, status, id)',
+    'CREATE INDEX IF NOT EXISTS outbox_delivered ON outbox (status, delivered_at)'
+]
+
+# Client errors that will not succeed on a retry; the event is dead-lettered instead
+PERMANENT_STATUS = set(range(400, 500)) - {408, 409, 425, 429}
+
+
+class WebhookOutbox:
+    """Durable SQLite outbox delivering webhooks in order per destination from a background worker pool"""
+
+    def __init__(self, path=None, workers=None, max_attempts=None):
+        self.path = path or os.getenv('OUTBOX_DB_PATH', 'data/webhook_outbox.db')
+        self.workers = workers or int(os.getenv('OUTBOX_WORKERS', '4'))
+        self.max_attempts = max_attempts or int(os.getenv('OUTBOX_MAX_ATTEMPTS', '10'))
+        self.base_delay = float(os.getenv('OUTBOX_RETRY_BASE_DELAY', '1'))
+        self.max_delay = float(os.getenv('OUTBOX_RETRY_MAX_DELAY', '300'))
+        # Longer than a request can take with the transport timeouts, so a live lease is never stolen
+        self.lease_seconds = float(os.getenv('OUTBOX_LEASE_SECONDS', '60'))
+        # Retries are scheduled by the outbox, so each attempt is a single request
+        self.policy = resilience.RetryPolicy(max_attempts=1)
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+
+        conn = self.connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        for statement in OUTBOX_SCHEMA:
+            conn.execute(statement)
+        self._destinations = {
+            row[0] for row in conn.execute("SELECT DISTINCT destination FROM outbox WHERE status = 'pending'")
+        }
+
+    def connection(self):
+        """One autocommit connection per thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # WAL with synchronous=NORMAL commits without an fsync and survives process crashes
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, destination, url, payload, idempotency_key=None):
+        """Durably queue a webhook; returns its idempotency key. A key already queued is not queued twice"""
+        idempotency_key = idempotency_key or uuid.uuid4().hex
+        now = time.time()
+        cursor = self.connection().execute(
+            'INSERT OR IGNORE INTO outbox (destination, url, payload, idempotency_key, next_attempt_at, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (destination, url, json.dumps(payload, default=str), idempotency_key, now, now)
+        )
+        if cursor.rowcount == 0:
+            logger.info(f"Webhook {idempotency_key} for {destination} already queued")
+            return idempotency_key
+
+        self._destinations.add(destination)
+        with self._wakeup:
+            self._wakeup.notify()
+        return idempotency_key
+
+    def _claim(self):
+        """Lease the oldest pending event of a destination that is due; returns (event, seconds until the next is due)"""
+        conn = self.connection()
+        now = time.time()
+        wait = 1.0
+        for destination in list(self._destinations):
+            row = conn.execute(
+                'SELECT id, destination, url, payload, idempotency_key, attempts, next_attempt_at, leased_until '
+                "FROM outbox WHERE destination = ? AND status = 'pending' ORDER BY id LIMIT 1",
+                (destination,)
+            ).fetchone()
+            if row is None:
+                continue
+
+            # Only the head of a destination's queue is eligible, which keeps delivery in order
+            ready_at = max(row[6], row[7])
+            if ready_at > now:
+                wait = min(wait, ready_at - now)
+                continue
+
+            claimed = conn.execute(
+                "UPDATE outbox SET leased_until = ? WHERE id = ? AND status = 'pending' AND leased_until = ?",
+                (now + self.lease_seconds, row[0], row[7])
+            ).rowcount
+            if claimed:
+                keys = ('id', 'destination', 'url', 'payload', 'idempotency_key', 'attempts')
+                return dict(zip(keys, row)), 0.0
+        return None, wait
+
+    def retry_delay(self, attempts, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+    def _deliver(self, event):
+        status, error, retry_after = None, None, None
+        try:
+            response = resilience.resilient_request(
+                'POST',
+                event['url'],
+                policy=self.policy,
+                data=event['payload'].encode('utf-8'),
+                headers={'Content-Type': 'application/json', 'Idempotency-Key': event['idempotency_key']}
+            )
+            status = response.status_code
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        except (resilience.CircuitOpenError, requests.RequestException) as e:
+            # Includes read timeouts on POST: the receiver dedupes on the idempotency key
+            error = f"{type(e).__name__}: {str(e)}"
+
+        attempts = event['attempts'] + 1
+        conn = self.connection()
+        if status is not None and 200 <= status < 300:
+            conn.execute(
+                "UPDATE outbox SET status = 'delivered', attempts = ?, delivered_at = ?, last_status = ?, leased_until = 0 "
+                'WHERE id = ?',
+                (attempts, time.time(), status, event['id'])
+            )
+            return True
+
+        error = error or f"HTTP {status}"
+        if status in PERMANENT_STATUS or attempts >= self.max_attempts:
+            logger.error(f"Webhook {event['idempotency_key']} to {event['destination']} failed after {attempts} attempts: {error}")
+            conn.execute(
+                "UPDATE outbox SET status = 'failed', attempts = ?, last_status = ?, last_error = ?, leased_until = 0 "
+                'WHERE id = ?',
+                (attempts, status, error, event['id'])
+            )
+            return False
+
+        delay = self.retry_delay(attempts, retry_after)
+        logger.warning(f"Webhook to {event['destination']} failed ({error}), retrying in {delay:.1f}s")
+        conn.execute(
+            'UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_status = ?, last_error = ?, leased_until = 0 '
+            'WHERE id = ?',
+            (attempts, time.time() + delay, status, error, event['id'])
+        )
+        return False
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            try:
+                event, wait = self._claim()
+                if event is not None:
+                    self._deliver(event)
+                    continue
+            except Exception as e:
+                logger.error(f"Webhook outbox worker error: {str(e)}")
+                wait = 1.0
+            with self._wakeup:
+                self._wakeup.wait(timeout=wait)
+
+    def start(self):
+        """Start the delivery workers; events left pending by an earlier run are delivered first"""
+        if self._threads:
+            return self
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"webhook-outbox-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Webhook outbox started with {self.workers} workers ({self.pending_count()} pending)")
+        return self
+
+    def stop(self, timeout=5.0):
+        """Stop the workers; undelivered events stay queued for the next start"""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def pending_count(self):
+        return self.connection().execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def wait_until_drained(self, timeout=None, poll_interval=0.05):
+        """Block until nothing is pending; returns False on timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self.pending_count():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(poll_interval)
+        return True
+
+    def stats(self):
+        """Event counts by status"""
+        counts = {'pending': 0, 'delivered': 0, 'failed': 0}
+        for status, count in self.connection().execute('SELECT status, COUNT(*) FROM outbox GROUP BY status'):
+            counts[status] = count
+        return counts
+
+    def purge_delivered(self, older_than_days=7):
+        """Delete delivered events older than the retention window; failed events are kept for inspection"""
+        cutoff = time.time() - older_than_days * 86400
+        removed = self.connection().execute(
+            "DELETE FROM outbox WHERE status = 'delivered' AND delivered_at < ?", (cutoff,)
+        ).rowcount
+        if removed:
+            logger.info(f"Purged {removed} delivered webhooks from the outbox")
+        return removed
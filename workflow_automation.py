@@ -1,10 +1,13 @@
 
-import requests
 import json
 from datetime import datetime
+from functools import partial
 import logging
 from dotenv import load_dotenv
 import os
+import resilience
+from fanout_dispatcher import FanOutDispatcher
+from webhook_outbox import WebhookOutbox
 
 load_dotenv()
 
@@ -18,7 +21,45 @@ class WorkflowAutomation:
         self.n8n_webhook = os.getenv('N8N_WEBHOOK')
         self.make_webhook = os.getenv('MAKE_WEBHOOK')
 
-    def trigger_power_automate_flow(self, brand_name, metrics_data, alert_type="update"):
+        # Webhooks go through a durable outbox so callers never block on a slow endpoint
+        self.outbox = None
+        if os.getenv('WEBHOOK_DELIVERY', 'outbox').lower() == 'outbox':
+            self.outbox = WebhookOutbox().start()
+
+        # Reports and alerts fan out concurrently; each destination gets its own deadline
+        self.dispatcher = FanOutDispatcher()
+        default_timeout = float(os.getenv('WEBHOOK_TIMEOUT_SECONDS', '15'))
+        self.webhook_timeouts = {
+            name: float(os.getenv(f'{name.upper()}_WEBHOOK_TIMEOUT_SECONDS', default_timeout))
+            for name in ('power_automate', 'n8n', 'make')
+        }
+
+    def deliver_webhook(self, destination, url, payload, idempotency_key=None):
+        """Queue a webhook in the outbox, or post it synchronously when the outbox is disabled"""
+        if self.outbox is not None:
+            self.outbox.enqueue(destination, url, payload, idempotency_key)
+            return True
+
+        headers = {'Content-Type': 'application/json'}
+        if idempotency_key:
+            headers['Idempotency-Key'] = idempotency_key
+        # The receiver dedupes on the idempotency key, so a keyed POST is safe to replay
+        response = resilience.resilient_request(
+            'POST', url, idempotent=bool(idempotency_key), json=payload, headers=headers
+        )
+
+        # Any 2xx is a delivery, as in the outbox
+        if not 200 <= response.status_code < 300:
+            logger.error(f"{destination} webhook failed: {response.status_code}")
+            return False
+        return True
+
+    @staticmethod
+    def event_key(destination, subject, event_type, period):
+        """Idempotency key of one event: the same alert or report in the same period is delivered once"""
+        return f"{destination}:{subject}:{event_type}:{period}"
+
+    def trigger_power_automate_flow(self, brand_name, metrics_data, alert_type="update", idempotency_key=None):
         """Trigger Power Automate workflow"""
         try:
             if not self.power_automate_webhook:
@@ -33,24 +74,16 @@ class WorkflowAutomation:
                 "dashboard_url": "http://localhost:8501"  # Streamlit default
             }
 
-            response = requests.post(
-                self.power_automate_webhook,
-                json=payload,
-                headers={'Content-Type': 'application/json'}
-            )
-
-            if response.status_code == 200:
+            if self.deliver_webhook('power_automate', self.power_automate_webhook, payload, idempotency_key):
                 logger.info(f"Power Automate flow triggered for {brand_name}")
                 return True
-            else:
-                logger.error(f"Power Automate trigger failed: {response.status_code}")
-                return False
+            return False
 
         except Exception as e:
             logger.error(f"Power Automate error: {str(e)}")
             return False
 
-    def trigger_n8n_workflow(self, brand_data, workflow_type="data_sync"):
+    def trigger_n8n_workflow(self, brand_data, workflow_type="data_sync", idempotency_key=None):
         """Trigger n8n workflow for data processing"""
         try:
             if not self.n8n_webhook:
@@ -63,24 +96,16 @@ class WorkflowAutomation:
                 "timestamp": datetime.now().isoformat()
             }
 
-            response = requests.post(
-                self.n8n_webhook,
-                json=payload,
-                headers={'Content-Type': 'application/json'}
-            )
-
-            if response.status_code == 200:
+            if self.deliver_webhook('n8n', self.n8n_webhook, payload, idempotency_key):
                 logger.info(f"n8n workflow triggered: {workflow_type}")
                 return True
-            else:
-                logger.error(f"n8n trigger failed: {response.status_code}")
-                return False
+            return False
 
         except Exception as e:
             logger.error(f"n8n workflow error: {str(e)}")
             return False
 
-    def trigger_make_scenario(self, alert_data, scenario_type="performance_alert"):
+    def trigger_make_scenario(self, alert_data, scenario_type="performance_alert", idempotency_key=None):
         """Trigger Make.com scenario"""
         try:
             if not self.make_webhook:
@@ -93,18 +118,10 @@ class WorkflowAutomation:
                 "timestamp": datetime.now().isoformat()
             }
 
-            response = requests.post(
-                self.make_webhook,
-                json=payload,
-                headers={'Content-Type': 'application/json'}
-            )
-
-            if response.status_code == 200:
+            if self.deliver_webhook('make', self.make_webhook, payload, idempotency_key):
                 logger.info(f"Make scenario triggered: {scenario_type}")
                 return True
-            else:
-                logger.error(f"Make trigger failed: {response.status_code}")
-                return False
+            return False
 
         except Exception as e:
             logger.error(f"Make scenario error: {str(e)}")
@@ -112,22 +129,36 @@ class WorkflowAutomation:
 
     def send_performance_alerts(self, brands_data):
         """Analyze performance and send alerts"""
-        alerts_sent = []
+        alerts = {}
+        calls = {}
+        # Refreshes run every few minutes; a standing alert goes out once per day
+        period = datetime.now().strftime('%Y-%m-%d')
 
         for brand_name, brand_data in brands_data.items():
             metrics = brand_data['metrics']
 
             # Check for performance thresholds
-            alerts = self.check_performance_thresholds(brand_name, metrics)
-
-            for alert in alerts:
+            for alert in self.check_performance_thresholds(brand_name, metrics):
                 # Send to Power Automate for email/Teams notifications
-                if self.trigger_power_automate_flow(brand_name, metrics, alert['type']):
-                    alerts_sent.append({
-                        'brand': brand_name,
-                        'alert': alert,
-                        'timestamp': datetime.now().isoformat()
-                    })
+                key = f"{brand_name}:{alert['type']}"
+                alerts[key] = (brand_name, alert)
+                calls[key] = partial(
+                    self.trigger_power_automate_flow, brand_name, metrics, alert['type'],
+                    idempotency_key=self.event_key('power_automate', brand_name, alert['type'], period)
+                )
+
+        results = self.dispatcher.dispatch(calls, self.webhook_timeouts['power_automate'])
+
+        alerts_sent = []
+        for key, result in results.items():
+            if result['success']:
+                brand_name, alert = alerts[key]
+                alerts_sent.append({
+                    'brand': brand_name,
+                    'alert': alert,
+                    'latency_ms': result['latency_ms'],
+                    'timestamp': datetime.now().isoformat()
+                })
 
         return alerts_sent
 
@@ -206,16 +237,27 @@ class WorkflowAutomation:
         return report_data
 
     def trigger_weekly_report_workflows(self, brands_data):
-        """Trigger all weekly report workflows"""
+        """Trigger all weekly report workflows concurrently; returns each platform's result and latency"""
         report_data = self.create_weekly_report_data(brands_data)
 
-        results = {
-            'power_automate': self.trigger_power_automate_flow("Portfolio", report_data, "weekly_report"),
-            'n8n': self.trigger_n8n_workflow(report_data, "weekly_report"),
-            'make': self.trigger_make_scenario(report_data, "weekly_report")
+        # A rerun of the same ISO week's report is not delivered twice
+        week = datetime.now().strftime('%G-W%V')
+        calls = {
+            'power_automate': partial(
+                self.trigger_power_automate_flow, "Portfolio", report_data, "weekly_report",
+                idempotency_key=self.event_key('power_automate', 'Portfolio', 'weekly_report', week)
+            ),
+            'n8n': partial(
+                self.trigger_n8n_workflow, report_data, "weekly_report",
+                idempotency_key=self.event_key('n8n', 'Portfolio', 'weekly_report', week)
+            ),
+            'make': partial(
+                self.trigger_make_scenario, report_data, "weekly_report",
+                idempotency_key=self.event_key('make', 'Portfolio', 'weekly_report', week)
+            )
         }
 
-        return results
+        return self.dispatcher.dispatch(calls, self.webhook_timeouts)
 
 def send_whatsapp_alert(message, phone_number=None):
     """Send WhatsApp alert using API (placeholder for Indian WhatsApp Business API)"""
@@ -245,7 +287,7 @@ def create_telegram_notification(message, chat_id=None):
             'parse_mode': 'Markdown'
         }
 
-        response = requests.post(url, json=payload)
+        response = resilience.resilient_request('POST', url, json=payload)
 
         if response.status_code == 200:
             logger.info("Telegram notification sent successfully")
@@ -282,3 +324,7 @@ if __name__ == "__main__":
     # Test weekly reports
     report_results = automation.trigger_weekly_report_workflows(sample_brands)
     print(f"Report workflows triggered: {report_results}")
+
+    if automation.outbox is not None:
+        automation.outbox.wait_until_drained(timeout=30)
+        automation.outbox.stop()